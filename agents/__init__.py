@@ -1,4 +1,4 @@
 # agents/__init__.py
 
-from .alphazero_agent.agent import CommunicatingAgent
-from .comm_agent.agent import DecisionMaker
\ No newline at end of file
+from .alphazero_agent.agent import DecisionMaker
+from .comm_agent.agent import CommunicatingAgent
\ No newline at end of file
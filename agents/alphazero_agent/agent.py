@@ -2,38 +2,146 @@
 
 from swarm import Agent
 import numpy as np
+import os
+import threading
 import uuid
-from typing import List
-from agents.alphazero_agent.agent import AlphaZeroAgent
+from typing import Dict, List, Optional, Tuple
+import torch
+from pydantic import PrivateAttr
+from agents.alphazero_agent.decision.alpha_zero import AlphaZeroAgent
+from agents.alphazero_agent.decision.models.network import AlphaZeroNetwork
+from agents.alphazero_agent.decision.models.inference import InferenceServer
+
+# Read-only networks shared by every DecisionMaker using the same checkpoint, with their version.
+# A shared network is never changed in place: training publishes a new one under the next version.
+SHARED_NETWORKS: Dict[Tuple[str, Tuple[int, int], int], Tuple[AlphaZeroNetwork, int]] = {}
+SHARED_NETWORKS_LOCK = threading.Lock()
+SHARED_SERVERS: Dict[Tuple[str, Tuple[int, int], int], InferenceServer] = {}
+
+def network_key(model_path: str, grid_size: Tuple[int, int], num_actions: int):
+    return (os.path.abspath(model_path), tuple(grid_size), num_actions)
+
+def read_only_network(grid_size: Tuple[int, int], num_actions: int, state_dict=None) -> AlphaZeroNetwork:
+    network = AlphaZeroNetwork(input_shape=grid_size, num_actions=num_actions)
+    if state_dict is not None:
+        network.load_state_dict(state_dict)
+    network.eval()
+    network.requires_grad_(False)
+    return network
+
+def shared_network(model_path: str, grid_size: Tuple[int, int], num_actions: int) -> Tuple[AlphaZeroNetwork, int]:
+    """
+    Returns the current network for `model_path` and its version, loading
+    the checkpoint on first use. Without a checkpoint the network keeps its
+    initial weights until a DecisionMaker is trained.
+    """
+    key = network_key(model_path, grid_size, num_actions)
+    with SHARED_NETWORKS_LOCK:
+        entry = SHARED_NETWORKS.get(key)
+        if entry is None:
+            state_dict = torch.load(model_path, map_location="cpu") if os.path.exists(model_path) else None
+            entry = SHARED_NETWORKS[key] = (read_only_network(grid_size, num_actions, state_dict), 0)
+        return entry
+
+def publish_network(model_path: str, grid_size: Tuple[int, int], num_actions: int, state_dict) -> int:
+    """
+    Replaces the shared network for `model_path` with a new one holding
+    `state_dict` and returns its version. Forward passes already running on
+    the old network finish undisturbed; DecisionMakers and the inference
+    server switch over before their next evaluation.
+    """
+    network = read_only_network(grid_size, num_actions, state_dict)
+    key = network_key(model_path, grid_size, num_actions)
+    with SHARED_NETWORKS_LOCK:
+        _, version = SHARED_NETWORKS.get(key, (None, -1))
+        SHARED_NETWORKS[key] = (network, version + 1)
+        server = SHARED_SERVERS.get(key)
+        if server is not None:
+            server.network = network
+        return version + 1
+
+def shared_inference_server(model_path: str, grid_size: Tuple[int, int], num_actions: int) -> InferenceServer:
+    """
+    Returns the InferenceServer batching evaluations of the shared network
+    for `model_path`, starting it on first use.
+    """
+    shared_network(model_path, grid_size, num_actions)
+    key = network_key(model_path, grid_size, num_actions)
+    with SHARED_NETWORKS_LOCK:
+        server = SHARED_SERVERS.get(key)
+        if server is None:
+            # Created from the current network, which publish_network may have replaced since the call above
+            server = SHARED_SERVERS[key] = InferenceServer(SHARED_NETWORKS[key][0])
+        return server
 
 class DecisionMaker(Agent):
-    def __init__(self, decision_maker_name: str = "agent-#" + str(uuid.uuid4()), instructions: str = "Only speak in Haikus."):
+    # Agent is a pydantic model, so per-instance state beyond its fields lives in private attributes
+    _agent: Optional[AlphaZeroAgent] = PrivateAttr(default=None)
+    _network_version: int = PrivateAttr(default=-1)
+    _grid_size: Tuple[int, int] = PrivateAttr(default=(5, 5))
+    _num_actions: int = PrivateAttr(default=4)
+    _batched_inference: bool = PrivateAttr(default=False)
+    _model_path: str = PrivateAttr(default="")
+
+    def __init__(self, decision_maker_name: str = "agent-#" + str(uuid.uuid4()), instructions: str = "Only speak in Haikus.",
+                 model_path: str = None, grid_size: Tuple[int, int] = (5, 5), num_actions: int = 4,
+                 batched_inference: bool = False):
         super().__init__(
             name=decision_maker_name,
             instructions=instructions,
             functions=[self.createSelf, self.act, self.learn],
         )
 
-        self._agent = AlphaZeroAgent(grid_size=(5,5), num_actions=4, learning_rate=1e-3)
-        self._agent = AlphaZeroAgent(grid_size=(5,5), num_actions=4, learning_rate=1e-3)
-        self._agent.train(episodes=100)
-        self.model_name = decision_maker_name + ".pth"
-        self.save_current_model()
-        self._agent = AlphaZeroAgent(grid_size=(5,5), num_actions=4, learning_rate=1e-3)
+        # Nothing is loaded or trained here; the agent is built on first use
+        self._agent = None
+        self._grid_size = grid_size
+        self._num_actions = num_actions
+        # Evaluate through one InferenceServer per checkpoint, batching with other DecisionMakers acting concurrently
+        self._batched_inference = batched_inference
+        self._model_path = model_path or decision_maker_name + ".pth"
+
+    @property
+    def model_name(self) -> str:
+        # Path of the checkpoint this DecisionMaker loads and saves
+        return self._model_path
+
+    def get_agent(self) -> AlphaZeroAgent:
+        network, version = shared_network(self.model_name, self._grid_size, self._num_actions)
+        if self._agent is None:
+            if self._batched_inference:
+                server = shared_inference_server(self.model_name, self._grid_size, self._num_actions)
+                self._agent = AlphaZeroAgent(grid_size=self._grid_size, num_actions=self._num_actions, inference_server=server)
+            else:
+                self._agent = AlphaZeroAgent(grid_size=self._grid_size, num_actions=self._num_actions, network=network)
+        elif version != self._network_version:
+            # Another DecisionMaker trained the shared weights; evaluations cached from the old ones are stale
+            self._agent.network = self._agent.mcts.network = network
+            self._agent.mcts.weights_changed()
+        self._network_version = version
+        return self._agent
 
     def createSelf(self):
-        self._agent = AlphaZeroAgent(grid_size=(5,5), num_actions=4, learning_rate=1e-3)
-        self._agent.train(episodes=100)
-        self.save_current_model()
-        return self._agent.select_action(state, possible_actions)
+        self.get_agent()
+        return f"{self.name} is ready."
 
     def act(self, state: np.ndarray, possible_actions: List[str]) -> str:
-        return self._agent.select_action(state, possible_actions)
-        self._agent.train(episodes=100)
+        return self.get_agent().select_action(state, possible_actions)
 
     def learn(self, state: np.ndarray, action: str, reward: float, next_state: np.ndarray, done: bool):
-        self._agent.train(episodes=100)
-        self.save_current_model()
+        self.train(episodes=100)
+
+    def train(self, episodes: int = 100):
+        """
+        Trains a private copy of the shared weights, saves the checkpoint and
+        then publishes the result as the new shared network, which every
+        DecisionMaker using it switches to before its next decision.
+        """
+        network, _ = shared_network(self.model_name, self._grid_size, self._num_actions)
+        trainer = AlphaZeroAgent(grid_size=self._grid_size, num_actions=self._num_actions)
+        trainer.network.load_state_dict(network.state_dict())
+        trainer.train(episodes=episodes)
+        trainer.save_model(self.model_name)
+        publish_network(self.model_name, self._grid_size, self._num_actions, trainer.network.state_dict())
 
     def save_current_model(self):
-        self._agent.save_model(self.model_name)
\ No newline at end of file
+        self.get_agent().save_model(self.model_name)
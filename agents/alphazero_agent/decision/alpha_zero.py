@@ -1,78 +1,209 @@
 # agents/alphazero_agent/agent.py
 
+import time
 import torch
+import torch.nn.functional as F
 import torch.optim as optim
 from typing import List, Tuple, Dict
 import numpy as np
 
 # Assuming these modules exist in your project structure
-from .models.network import AlphaZeroNetwork
+from .models.network import AlphaZeroNetwork, FullyConvolutionalNetwork
+from .models.inference import InferenceServer
 from .search.mcts import MCTS
+from .search.array_tree import ArrayMCTS
 from .environment.gridworld import GridWorld
+from .environment.encoding import StateEncoder, WindowEncoder
+from .training.replay_buffer import ReplayBuffer
+from .training.self_play import SelfPlayPool
 
 class AlphaZeroAgent:
-    def __init__(self, grid_size: Tuple[int, int]=(5,5), num_actions: int=4, learning_rate: float=1e-3):
-        self.env = GridWorld(size=grid_size)
+    def __init__(self, grid_size: Tuple[int, int]=(5,5), num_actions: int=4, learning_rate: float=1e-3,
+                 eval_batch_size: int=1, reuse_tree: bool=False, array_tree: bool=False,
+                 num_workers: int=1, parallel: str="leaf", model_based: bool=False, seed=None,
+                 network: AlphaZeroNetwork=None, inference_server: InferenceServer=None,
+                 fully_convolutional: bool=False, window: int=None, discount: float=0.95, value_scale: float=100.0):
+        # Constructor arguments, used to build identical agents in self-play workers
+        self.config = dict(grid_size=grid_size, num_actions=num_actions, learning_rate=learning_rate,
+                           eval_batch_size=eval_batch_size, reuse_tree=reuse_tree, array_tree=array_tree,
+                           num_workers=num_workers, parallel=parallel, model_based=model_based,
+                           fully_convolutional=fully_convolutional, window=window, discount=discount, value_scale=value_scale)
+        self.env = GridWorld(size=grid_size, goal=(grid_size[0] - 1, grid_size[1] - 1), seed=seed)
         self.num_actions = num_actions
-        self.network = AlphaZeroNetwork(input_shape=grid_size, num_actions=num_actions)
+        # With a window the network sees a fixed-size egocentric view instead of the whole map
+        self.encoder = WindowEncoder(window) if window else StateEncoder(grid_size)
+        self.input_buffer = self.encoder.empty()
+        input_shape, in_channels = self.encoder.grid_size, self.encoder.num_channels
+        # A given network is used as is, so several agents can search with the same weights
+        if network is None and inference_server is not None:
+            network = inference_server.network
+        if network is None:
+            # The fully convolutional variant's weights work for any grid size
+            if fully_convolutional:
+                network = FullyConvolutionalNetwork(num_actions=num_actions, in_channels=in_channels, input_shape=input_shape)
+            else:
+                network = AlphaZeroNetwork(input_shape=input_shape, num_actions=num_actions, in_channels=in_channels)
+            # Searches with a fresh network must not update its BatchNorm statistics
+            network.eval()
+        self.network = network
         self.optimizer = optim.Adam(self.network.parameters(), lr=learning_rate)
-        self.mcts = MCTS(self.network, num_simulations=50)
         self.action_map = {0: "up", 1: "down", 2: "left", 3: "right"}
         self.action_to_index = {v: k for k, v in self.action_map.items()}
-
-    def select_action(self, state: Dict, possible_actions: List[str]) -> str:
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.replay_buffer = None
+        # Values are discounted returns divided by value_scale (the goal reward) and clipped to [-1, 1],
+        # so the value loss stays on the scale of the policy loss and Q on the scale of the priors
+        self.discount = discount
+        self.value_scale = value_scale
+        # Search by stepping copies of the environment instead of re-evaluating the root state
+        self.model_based = model_based
+        mcts_class = ArrayMCTS if array_tree else MCTS
+        self.mcts = mcts_class(self.network, num_simulations=50, eval_batch_size=eval_batch_size, reuse_tree=reuse_tree,
+                                num_workers=num_workers, parallel=parallel,
+                                action_space=list(self.action_map.values()),
+                                encoder=self.encoder.encode, evaluator=inference_server, seed=seed,
+                                discount=discount if model_based else 1.0, reward_scale=1.0 / value_scale)
+
+    def select_action(self, state: Dict, possible_actions: List[str], model: GridWorld=None) -> str:
         # Convert the state dict to a format suitable for your neural network
         network_input = self.state_to_network_input(state)
-        action = self.mcts.search(network_input, possible_actions)
+        action = self.mcts.search(network_input, possible_actions, model)
         return action
 
+    def observe(self, action: str, state: Dict):
+        # Carry the searched subtree of the played action over to the next decision
+        if self.mcts.reuse_tree:
+            self.mcts.advance(action, self.state_to_network_input(state))
+
     def state_to_network_input(self, state: Dict) -> np.ndarray:
-        # Convert the state dict to a numpy array suitable for your neural network
-        # This is a placeholder implementation; adjust according to your network architecture
-        grid_size = state['grid_size']
-        input_channels = 6  # terrain, agent, goal, npcs, items, weather
-        network_input = np.zeros((grid_size[0], grid_size[1], input_channels))
-
-        # Encode terrain
-        terrain_types = {"grass": 0, "forest": 1, "mountain": 2, "water": 3, "desert": 4}
-        for i in range(grid_size[0]):
-            for j in range(grid_size[1]):
-                network_input[i, j, 0] = terrain_types[state['terrain'][i][j]]
-
-        # Encode agent position
-        network_input[state['agent_position'][0], state['agent_position'][1], 1] = 1
-
-        # Encode goal position
-        network_input[state['goal_position'][0], state['goal_position'][1], 2] = 1
-
-        # Encode NPCs
-        for npc in state['npcs'].values():
-            network_input[npc['position'][0], npc['position'][1], 3] = 1
-
-        # Encode items
-        for item in state['items'].values():
-            network_input[item['position'][0], item['position'][1], 4] = 1
-
-        # Encode weather (as a global feature)
-        weather_types = ["clear", "cloudy", "rainy", "stormy", "foggy"]
-        weather_index = weather_types.index(state['weather'])
-        network_input[:, :, 5] = weather_index / len(weather_types)
-
-        # You might want to add more channels for other features like time, events, etc.
-
-        return network_input
-
-    def train(self, episodes: int=1000):
-        for episode in range(episodes):
-            state = self.env.reset()
-            done = False
-            total_reward = 0
-            while not done:
-                possible_actions = self.env.get_possible_actions()
-                action = self.select_action(state, possible_actions)
-                state, reward, done = self.env.step(action)
-                total_reward += reward
-            print(f"Episode {episode + 1}: Total Reward = {total_reward}")
+        # Float32 (C, H, W) encoding written into the agent's reusable input buffer
+        return self.encoder.encode(state, self.input_buffer)
+
+    def visit_policy(self, visits: Dict[str, int]) -> np.ndarray:
+        # Root visit counts as a distribution over the network's actions
+        policy = np.zeros(self.num_actions, dtype=np.float32)
+        for action, count in visits.items():
+            if action in self.action_to_index:
+                policy[self.action_to_index[action]] = count
+        total = policy.sum()
+        if total > 0:
+            return policy / total
+        return np.full(self.num_actions, 1.0 / self.num_actions, dtype=np.float32)
+
+    def sample_action(self, visits: Dict[str, int]) -> str:
+        # Play in proportion to the visit counts so self-play keeps exploring
+        actions = list(visits)
+        counts = np.array([visits[action] for action in actions], dtype=np.float64)
+        if counts.sum() == 0:
+            return actions[self.rng.integers(len(actions))]
+        return actions[self.rng.choice(len(actions), p=counts / counts.sum())]
+
+    def self_play(self):
+        """
+        Plays one episode with MCTS and returns the encoded states, visit
+        distributions and value targets of every position, plus the total reward.
+        """
+        self.network.eval()
+        state = self.env.reset()
+        self.mcts.reset()
+        states, policies, rewards = [], [], []
+        done = False
+        while not done:
+            possible_actions = self.env.get_possible_actions()
+            network_input = self.state_to_network_input(state)
+            states.append(network_input.copy())
+            self.select_action(state, possible_actions, self.env if self.model_based else None)
+            policies.append(self.visit_policy(self.mcts.visits))
+            action = self.sample_action(self.mcts.visits)
+            state, reward, done = self.env.step(action)
+            self.observe(action, state)
+            rewards.append(reward)
+        return np.stack(states), np.stack(policies), self.value_targets(rewards), float(sum(rewards))
+
+    def value_targets(self, rewards: List[float]) -> np.ndarray:
+        # Scaled, discounted returns-to-go, matching how the search backs up rewards
+        returns = np.zeros(len(rewards), dtype=np.float32)
+        running = 0.0
+        for i in range(len(rewards) - 1, -1, -1):
+            running = rewards[i] + self.discount * running
+            returns[i] = running
+        return np.clip(returns / self.value_scale, -1.0, 1.0)
+
+    def train_step(self, states: np.ndarray, policies: np.ndarray, values: np.ndarray) -> float:
+        self.network.train()
+        states = torch.from_numpy(states)
+        target_policies = torch.from_numpy(policies)
+        target_values = torch.from_numpy(values)
+        logits, predicted_values = self.network(states)
+        policy_loss = -(target_policies * F.log_softmax(logits, dim=1)).sum(dim=1).mean()
+        value_loss = F.mse_loss(predicted_values.view(-1), target_values)
+        loss = policy_loss + value_loss
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+        return loss.item()
+
+    def train(self, episodes: int=1000, batch_size: int=64, updates_per_episode: int=8,
+              buffer_capacity: int=10000, checkpoint_every: int=0, checkpoint_path: str="alphazero.pt",
+              self_play_workers: int=0, publish_every: int=1) -> Dict[str, float]:
+        """
+        Alternates self-play episodes with minibatch updates sampled from the
+        replay buffer. Every `checkpoint_every` episodes the weights are saved
+        to `checkpoint_path`. Returns throughput metrics for the whole run.
+
+        With `self_play_workers` > 0 the episodes are played by a pool of
+        worker processes while this process only learns; the workers get the
+        new weights every `publish_every` episodes.
+        """
+        if self.replay_buffer is None:
+            self.replay_buffer = ReplayBuffer(buffer_capacity, self.input_buffer.shape, self.num_actions)
+        pool = SelfPlayPool(self, self_play_workers, seed=self.seed) if self_play_workers > 0 else None
+        games = pool.episodes(episodes) if pool else (self.self_play() for _ in range(episodes))
+        positions, train_steps = 0, 0
+        play_time, train_time = 0.0, 0.0
+        run_start = time.perf_counter()
+        try:
+            for episode in range(episodes):
+                start = time.perf_counter()
+                states, policies, returns, total_reward = next(games)
+                play_time += time.perf_counter() - start
+                self.replay_buffer.add_batch(states, policies, returns)
+                positions += len(states)
+
+                loss = None
+                if len(self.replay_buffer) >= batch_size:
+                    start = time.perf_counter()
+                    for _ in range(updates_per_episode):
+                        loss = self.train_step(*self.replay_buffer.sample(batch_size, self.rng))
+                    train_time += time.perf_counter() - start
+                    train_steps += updates_per_episode
+                    # Cached evaluations came from the old weights
+                    self.mcts.weights_changed()
+                    if pool and (episode + 1) % publish_every == 0:
+                        pool.publish(self.network)
+                self.network.eval()
+
+                if checkpoint_every and (episode + 1) % checkpoint_every == 0:
+                    self.save_model(checkpoint_path)
+                loss_text = f", Loss = {loss:.4f}" if loss is not None else ""
+                print(f"Episode {episode + 1}: Total Reward = {total_reward}{loss_text}")
+        finally:
+            if pool:
+                pool.close()
+
+        if pool:
+            # Workers keep playing while the learner trains, so count wall-clock time
+            play_time = time.perf_counter() - run_start
+        metrics = {
+            "positions": positions,
+            "train_steps": train_steps,
+            "positions_per_sec": positions / play_time if play_time else 0.0,
+            "train_steps_per_sec": train_steps / train_time if train_time else 0.0,
+        }
+        print(f"Self-play: {metrics['positions_per_sec']:.1f} positions/sec, "
+              f"training: {metrics['train_steps_per_sec']:.1f} steps/sec")
+        return metrics
 
     def save_model(self, path: str):
         torch.save(self.network.state_dict(), path)
@@ -0,0 +1,10 @@
+# environment/constants.py
+
+import numpy as np
+
+TERRAIN_TYPES = ["grass", "forest", "mountain", "water", "desert"]
+WEATHER_TYPES = ["clear", "cloudy", "rainy", "stormy", "foggy"]
+ITEM_TYPES = ["weapon", "potion", "key", "treasure"]
+
+# Step reward per terrain code, indexed like TERRAIN_TYPES
+TERRAIN_REWARDS = np.array([0, -1, -2, -3, -2], dtype=np.int32)
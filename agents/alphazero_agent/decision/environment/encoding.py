@@ -0,0 +1,103 @@
+# environment/encoding.py
+
+from typing import Dict, List, Tuple
+import numpy as np
+
+from .constants import WEATHER_TYPES
+
+NUM_CHANNELS = 6  # terrain, agent, goal, npcs, items, weather
+
+WEATHER_INDEX = {weather: i for i, weather in enumerate(WEATHER_TYPES)}
+
+class StateEncoder:
+    """
+    Encodes GridWorld state dicts into float32 arrays of shape (6, H, W),
+    the channel-first layout AlphaZeroNetwork expects.
+
+    `encode` writes into `out` when given, so a caller can reuse one buffer
+    for every decision; otherwise it returns a new array. `encode_batch`
+    fills a (N, 6, H, W) array, reusing an internal buffer by default that
+    is only valid until the next call.
+    """
+    num_channels = NUM_CHANNELS
+
+    def __init__(self, grid_size: Tuple[int, int]):
+        self.grid_size = tuple(grid_size)
+        self.batch_buffer = self.empty(0)
+
+    def empty(self, batch_size: int=None) -> np.ndarray:
+        shape = (self.num_channels,) + self.grid_size
+        if batch_size is not None:
+            shape = (batch_size,) + shape
+        return np.zeros(shape, dtype=np.float32)
+
+    def encode(self, state: Dict, out: np.ndarray=None) -> np.ndarray:
+        if out is None:
+            out = self.empty()
+        out[0] = state['terrain']
+        out[1:3] = 0
+        out[1, state['agent_position'][0], state['agent_position'][1]] = 1
+        out[2, state['goal_position'][0], state['goal_position'][1]] = 1
+        # Occupancy grids hold an entity slot per cell, -1 when empty
+        out[3] = state['npc_grid'] >= 0
+        out[4] = state['item_grid'] >= 0
+        # Weather is a global feature broadcast over the grid
+        out[5] = WEATHER_INDEX[state['weather']] / len(WEATHER_TYPES)
+        return out
+
+    def encode_batch(self, states: List[Dict], out: np.ndarray=None) -> np.ndarray:
+        if out is None:
+            if len(self.batch_buffer) < len(states):
+                self.batch_buffer = self.empty(len(states))
+            out = self.batch_buffer[:len(states)]
+        for state, state_out in zip(states, out):
+            self.encode(state, state_out)
+        return out
+
+def window_view(array: np.ndarray, center: Tuple[int, int], window: int) -> Tuple[np.ndarray, Tuple[slice, slice]]:
+    """
+    The part of `array` inside a window x window square centered on
+    `center`, as a view (no copy), and the slices of the window it covers.
+    Cells of the window outside the array are not covered.
+    """
+    radius = window // 2
+    top, left = center[0] - radius, center[1] - radius
+    rows = slice(max(top, 0), min(top + window, array.shape[0]))
+    cols = slice(max(left, 0), min(left + window, array.shape[1]))
+    return array[rows, cols], (slice(rows.start - top, rows.stop - top), slice(cols.start - left, cols.stop - left))
+
+class WindowEncoder(StateEncoder):
+    """
+    Egocentric encoding of a window x window square centered on the agent,
+    so the cost depends on the window rather than the map. Uses the
+    StateEncoder channels, with terrain -1 outside the map, plus two
+    channels pointing towards the goal: tanh of the row and column offsets
+    in window widths, broadcast over the window.
+    """
+    num_channels = NUM_CHANNELS + 2
+
+    def __init__(self, window: int):
+        if window % 2 == 0:
+            raise ValueError(f"window must be odd to center on the agent, got {window}")
+        super().__init__((window, window))
+        self.window = window
+
+    def encode(self, state: Dict, out: np.ndarray=None) -> np.ndarray:
+        if out is None:
+            out = self.empty()
+        agent, goal = state['agent_position'], state['goal_position']
+        terrain, (rows, cols) = window_view(state['terrain'], agent, self.window)
+        out[0] = -1
+        out[0, rows, cols] = terrain
+        out[1:5] = 0
+        out[1, self.window // 2, self.window // 2] = 1
+        goal_row = goal[0] - agent[0] + self.window // 2
+        goal_col = goal[1] - agent[1] + self.window // 2
+        if 0 <= goal_row < self.window and 0 <= goal_col < self.window:
+            out[2, goal_row, goal_col] = 1
+        out[3, rows, cols] = window_view(state['npc_grid'], agent, self.window)[0] >= 0
+        out[4, rows, cols] = window_view(state['item_grid'], agent, self.window)[0] >= 0
+        out[5] = WEATHER_INDEX[state['weather']] / len(WEATHER_TYPES)
+        out[6] = np.tanh((goal[0] - agent[0]) / self.window)
+        out[7] = np.tanh((goal[1] - agent[1]) / self.window)
+        return out
@@ -0,0 +1,130 @@
+# environment/events.py
+
+from typing import Dict, List, NamedTuple, Optional
+import numpy as np
+
+from .constants import ITEM_TYPES, TERRAIN_TYPES, WEATHER_TYPES
+
+# Event kinds; each maps to the "type" name GridWorld events have always used
+DIALOGUE = 0
+NO_INTERACTION = 1
+ITEM_USE = 2
+NO_ITEM = 3
+DISCOVERY = 4
+DANGER = 5
+QUEST = 6
+WEATHER = 7
+TERRAIN_CHANGE = 8
+NPC_REMOVED = 9
+NPC_ADDED = 10
+ITEM_REMOVED = 11
+ITEM_ADDED = 12
+
+EVENT_TYPES = ["dialogue", "action", "item_use", "action", "discovery", "danger", "quest", "weather",
+               "terrain_change", "npc_removed", "npc_added", "item_removed", "item_added"]
+
+EVENT_DTYPE = np.dtype([
+    ("kind", np.uint8),
+    ("x", np.int32),
+    ("y", np.int32),
+    ("entity", np.int32),  # NPC/item number, or index of an interned text
+    ("a", np.int32),       # kind-specific codes, e.g. old terrain, item type, weather
+    ("b", np.int32),
+])
+
+class Event(NamedTuple):
+    kind: int
+    x: int
+    y: int
+    entity: int
+    a: int
+    b: int
+    text: Optional[str] = None
+
+    @property
+    def type(self) -> str:
+        return EVENT_TYPES[self.kind]
+
+    @property
+    def content(self) -> str:
+        # Rendered only when someone asks for it
+        if self.kind == DIALOGUE:
+            return self.text
+        if self.kind == NO_INTERACTION:
+            return "No one to interact with here."
+        if self.kind == ITEM_USE:
+            return f"Used {ITEM_TYPES[self.a]}"
+        if self.kind == NO_ITEM:
+            return "No item to use here."
+        if self.kind == DISCOVERY:
+            return "You found a hidden path!"
+        if self.kind == DANGER:
+            return "A wild animal appears!"
+        if self.kind == QUEST:
+            return "A villager asks for your help to find a lost item."
+        if self.kind == WEATHER:
+            return f"Weather changed to {WEATHER_TYPES[self.a]}"
+        if self.kind == TERRAIN_CHANGE:
+            return f"Terrain at ({self.x}, {self.y}) changed from {TERRAIN_TYPES[self.a]} to {TERRAIN_TYPES[self.b]}"
+        if self.kind == NPC_REMOVED:
+            return f"NPC NPC-{self.entity} has left the area"
+        if self.kind == NPC_ADDED:
+            return f"New NPC NPC-{self.entity} has appeared"
+        if self.kind == ITEM_REMOVED:
+            return f"Item Item-{self.entity} has disappeared"
+        if self.kind == ITEM_ADDED:
+            return f"New item Item-{self.entity} has appeared"
+        raise ValueError(f"Unknown event kind {self.kind}")
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"type": self.type, "content": self.content}
+
+class EventLog:
+    """
+    Fixed-capacity ring buffer of compact event records. Once full, each new
+    event overwrites the oldest one. Free text (NPC dialogue) is interned
+    and stored by index.
+    """
+    def __init__(self, capacity: int=64):
+        self.records = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.count = 0
+        self.texts = []
+        self.text_index = {}
+
+    def __len__(self):
+        return min(self.count, len(self.records))
+
+    def append(self, kind: int, x: int=0, y: int=0, entity: int=0, a: int=0, b: int=0, text: str=None):
+        if text is not None:
+            entity = self.intern(text)
+        self.records[self.count % len(self.records)] = (kind, x, y, entity, a, b)
+        self.count += 1
+
+    def intern(self, text: str) -> int:
+        index = self.text_index.get(text)
+        if index is None:
+            index = self.text_index[text] = len(self.texts)
+            self.texts.append(text)
+        return index
+
+    def event(self, record) -> Event:
+        kind, x, y, entity, a, b = record.tolist()
+        return Event(kind, x, y, entity, a, b, self.texts[entity] if kind == DIALOGUE else None)
+
+    def tail(self, n: int) -> List[Event]:
+        # The last n events, oldest first
+        n = min(n, len(self))
+        indices = np.arange(self.count - n, self.count) % len(self.records)
+        return [self.event(record) for record in self.records[indices]]
+
+    def last(self) -> Event:
+        return self.event(self.records[(self.count - 1) % len(self.records)])
+
+    def copy(self) -> "EventLog":
+        # The interned texts are append-only, so copies can share them
+        log = EventLog.__new__(EventLog)
+        log.records = self.records.copy()
+        log.count = self.count
+        log.texts = self.texts
+        log.text_index = self.text_index
+        return log
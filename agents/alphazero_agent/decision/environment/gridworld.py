@@ -1,15 +1,125 @@
 import numpy as np
-from typing import List, Tuple, Dict
-import random
+from typing import Any, Callable, List, Tuple, Dict, NamedTuple, Sequence
+
+from . import events as ev
+from .constants import ITEM_TYPES, TERRAIN_REWARDS, TERRAIN_TYPES, WEATHER_TYPES
+from .events import Event, EventLog
+
+# Upper bound on the uniform draws a single step consumes
+STEP_DRAWS = 12
+
+def entity_number(entity_id: str) -> int:
+    # "NPC-3" -> 3; event records store the number instead of the id string
+    return int(entity_id.rsplit("-", 1)[1])
+
+class EntityTable:
+    """
+    Entities (NPCs or items) stored in slot arrays, with an occupancy grid
+    holding the slot of an entity on each cell (-1 when empty) for O(1)
+    lookup by position. Freed slots go on a free list and are reused.
+    """
+    def __init__(self, size: Tuple[int, int], capacity: int=8):
+        self.grid = np.full(size, -1, dtype=np.int32)
+        self.positions = np.zeros((capacity, 2), dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.kinds = np.zeros(capacity, dtype=np.uint8)
+        self.values = np.zeros(capacity, dtype=np.int32)
+        self.ids = [None] * capacity
+        self.texts = [None] * capacity
+        self.slots = {}
+        # Free slots, lowest last so it is handed out first
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, entity_id: str, position: Tuple[int, int], kind: int=0, value: int=0, text: str=None) -> int:
+        # Like assigning into a dict, an existing id is replaced
+        if entity_id in self.slots:
+            self.remove(entity_id)
+        if not self.free:
+            self.grow()
+        slot = self.free.pop()
+        self.positions[slot] = position
+        self.alive[slot] = True
+        self.kinds[slot] = kind
+        self.values[slot] = value
+        self.ids[slot] = entity_id
+        self.texts[slot] = text
+        self.slots[entity_id] = slot
+        if self.grid[position] < 0:
+            self.grid[position] = slot
+        return slot
+
+    def remove(self, entity_id: str):
+        slot = self.slots.pop(entity_id)
+        self.alive[slot] = False
+        self.free.append(slot)
+        position = tuple(self.positions[slot])
+        if self.grid[position] == slot:
+            # Hand the cell over to another entity standing on it, if any
+            others = np.flatnonzero(self.alive & (self.positions == position).all(axis=1))
+            self.grid[position] = others[0] if len(others) else -1
+
+    def at(self, position: Tuple[int, int]) -> int:
+        return int(self.grid[position])
+
+    def copy(self) -> "EntityTable":
+        table = EntityTable.__new__(EntityTable)
+        table.grid = self.grid.copy()
+        table.positions = self.positions.copy()
+        table.alive = self.alive.copy()
+        table.kinds = self.kinds.copy()
+        table.values = self.values.copy()
+        table.ids = list(self.ids)
+        table.texts = list(self.texts)
+        table.slots = dict(self.slots)
+        table.free = list(self.free)
+        return table
+
+    def grow(self):
+        capacity = len(self.alive)
+        self.positions = np.concatenate([self.positions, np.zeros_like(self.positions)])
+        self.alive = np.concatenate([self.alive, np.zeros_like(self.alive)])
+        self.kinds = np.concatenate([self.kinds, np.zeros_like(self.kinds)])
+        self.values = np.concatenate([self.values, np.zeros_like(self.values)])
+        self.ids.extend([None] * capacity)
+        self.texts.extend([None] * capacity)
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+class GridWorldSnapshot(NamedTuple):
+    agent_pos: Tuple[int, int]
+    done: bool
+    steps: int
+    terrain: np.ndarray
+    npcs: EntityTable
+    items: EntityTable
+    weather: str
+    time: Tuple[int, int, int]
+    events: EventLog
+    rng_state: Dict[str, Any]
+
+# Attributes shared copy-on-write between a world and its snapshots
+SHARED_ATTRIBUTES = ("terrain", "npcs", "items", "events")
 
 class GridWorld:
-    def __init__(self, size: Tuple[int, int]=(10, 10), start: Tuple[int, int]=(0, 0), goal: Tuple[int, int]=(9, 9)):
+    def __init__(self, size: Tuple[int, int]=(10, 10), start: Tuple[int, int]=(0, 0), goal: Tuple[int, int]=(9, 9), seed=None,
+                 event_capacity: int=64):
         self.size = size
         self.start = start
         self.goal = goal
+        self.event_capacity = event_capacity
+        # Callables receiving every Event as it happens; the world itself only keeps the last event_capacity
+        self.event_sinks = []
+        # Per-world generator; seed with an int for replays or a spawned SeedSequence
+        self.rng = np.random.default_rng(seed)
+        self.draws = []
+        self.draw_index = 0
+        self.shared = set()
         self.reset()
 
     def reset(self):
+        self.shared.clear()
         self.agent_pos = self.start
         self.done = False
         self.steps = 0
@@ -18,53 +128,158 @@ class GridWorld:
         self.items = self.generate_items()
         self.weather = "clear"
         self.time = {"hour": 12, "minute": 0, "day": 1}
-        self.events = []
+        self.events = EventLog(self.event_capacity)
         return self.get_state()
 
-    def generate_terrain(self):
-        terrain_types = ["grass", "forest", "mountain", "water", "desert"]
-        return [[random.choice(terrain_types) for _ in range(self.size[1])] for _ in range(self.size[0])]
+    def generate_terrain(self) -> np.ndarray:
+        # Terrain codes index TERRAIN_TYPES
+        return self.rng.integers(len(TERRAIN_TYPES), size=self.size, dtype=np.uint8)
+
+    def uniform(self) -> float:
+        # Served from the current step's pre-drawn block while it lasts
+        if self.draw_index < len(self.draws):
+            u = self.draws[self.draw_index]
+            self.draw_index += 1
+            return u
+        return self.rng.random()
+
+    def choice(self, options: Sequence):
+        return options[min(int(self.uniform() * len(options)), len(options) - 1)]
 
-    def generate_npcs(self):
-        npcs = {}
+    def randint(self, low: int, high: int) -> int:
+        # Inclusive of both ends, like random.randint
+        return low + min(int(self.uniform() * (high - low + 1)), high - low)
+
+    def random_position(self) -> Tuple[int, int]:
+        return (self.randint(0, self.size[0]-1), self.randint(0, self.size[1]-1))
+
+    def generate_npcs(self) -> EntityTable:
+        npcs = EntityTable(self.size)
         for i in range(3):  # Generate 3 NPCs
-            npc_id = f"NPC-{i}"
-            npcs[npc_id] = {
-                "position": (random.randint(0, self.size[0]-1), random.randint(0, self.size[1]-1)),
-                "dialogue": f"Hello, I'm NPC {i}!"
-            }
+            npcs.add(f"NPC-{i}", self.random_position(), text=f"Hello, I'm NPC {i}!")
         return npcs
 
-    def generate_items(self):
-        items = {}
+    def generate_items(self) -> EntityTable:
+        items = EntityTable(self.size)
         for i in range(5):  # Generate 5 items
-            item_id = f"Item-{i}"
-            items[item_id] = {
-                "position": (random.randint(0, self.size[0]-1), random.randint(0, self.size[1]-1)),
-                "type": random.choice(["weapon", "potion", "key", "treasure"]),
-                "value": random.randint(1, 100)
-            }
+            position = self.random_position()
+            items.add(f"Item-{i}", position, kind=self.randint(0, len(ITEM_TYPES)-1), value=self.randint(1, 100))
         return items
 
+    @staticmethod
+    def read_only(array: np.ndarray) -> np.ndarray:
+        view = array.view()
+        view.flags.writeable = False
+        return view
+
     def get_state(self):
+        # terrain and the entity grids are read-only views of the world's arrays, so callers cannot
+        # corrupt the world through them; they still reflect later in-place steps
         state = {
             "grid_size": self.size,
             "agent_position": self.agent_pos,
             "goal_position": self.goal,
-            "terrain": self.terrain,
-            "npcs": self.npcs,
-            "items": self.items,
+            "terrain": self.read_only(self.terrain),
+            "npc_grid": self.read_only(self.npcs.grid),
+            "item_grid": self.read_only(self.items.grid),
+            "npcs": self.get_npcs(),
+            "items": self.get_items(),
             "weather": self.weather,
-            "time": self.time,
-            "events": self.events[-5:],  # Last 5 events
+            "time": dict(self.time),
+            "events": [event.to_dict() for event in self.events.tail(5)],  # Last 5 events
             "steps": self.steps
         }
         return state
 
+    def snapshot(self) -> GridWorldSnapshot:
+        """
+        Captures the world's state in O(1) for the arrays, which are shared
+        with the snapshot and only copied by whichever side changes them first.
+        """
+        self.shared.update(SHARED_ATTRIBUTES)
+        return GridWorldSnapshot(
+            agent_pos=self.agent_pos,
+            done=self.done,
+            steps=self.steps,
+            terrain=self.terrain,
+            npcs=self.npcs,
+            items=self.items,
+            weather=self.weather,
+            time=(self.time["hour"], self.time["minute"], self.time["day"]),
+            events=self.events,
+            rng_state=self.rng.bit_generator.state,
+        )
+
+    def restore(self, snapshot: GridWorldSnapshot):
+        # The snapshot stays valid and can be restored again
+        self.shared = set(SHARED_ATTRIBUTES)
+        self.agent_pos = snapshot.agent_pos
+        self.done = snapshot.done
+        self.steps = snapshot.steps
+        self.terrain = snapshot.terrain
+        self.npcs = snapshot.npcs
+        self.items = snapshot.items
+        self.weather = snapshot.weather
+        hour, minute, day = snapshot.time
+        self.time = {"hour": hour, "minute": minute, "day": day}
+        self.events = snapshot.events
+        # Restoring the generator too makes replays from a snapshot deterministic
+        self.rng.bit_generator.state = snapshot.rng_state
+
+    def clone(self) -> "GridWorld":
+        # A copy for simulating ahead, e.g. in MCTS, without disturbing this world
+        world = GridWorld.__new__(GridWorld)
+        world.size = self.size
+        world.start = self.start
+        world.goal = self.goal
+        world.event_capacity = self.event_capacity
+        world.event_sinks = []
+        world.rng = np.random.default_rng()
+        world.draws = []
+        world.draw_index = 0
+        world.restore(self.snapshot())
+        return world
+
+    def writable(self, name: str):
+        # Copy-on-write: copy a shared array or table before its first change
+        if name in self.shared:
+            self.shared.discard(name)
+            setattr(self, name, getattr(self, name).copy())
+        return getattr(self, name)
+
+    def add_event(self, kind: int, **fields):
+        self.writable("events").append(kind, **fields)
+        if self.event_sinks:
+            event = self.events.last()
+            for sink in self.event_sinks:
+                sink(event)
+
+    def subscribe(self, sink: Callable[[Event], None]):
+        self.event_sinks.append(sink)
+
+    def unsubscribe(self, sink: Callable[[Event], None]):
+        self.event_sinks.remove(sink)
+
+    def get_npcs(self) -> Dict[str, Dict]:
+        # Dict view of the NPC table, for display and debugging
+        return {self.npcs.ids[slot]: {"position": tuple(self.npcs.positions[slot].tolist()), "dialogue": self.npcs.texts[slot]}
+                for slot in self.npcs.slots.values()}
+
+    def get_items(self) -> Dict[str, Dict]:
+        # Dict view of the item table, for display and debugging
+        return {self.items.ids[slot]: {"position": tuple(self.items.positions[slot].tolist()),
+                                       "type": ITEM_TYPES[self.items.kinds[slot]],
+                                       "value": int(self.items.values[slot])}
+                for slot in self.items.slots.values()}
+
     def step(self, action: str) -> Tuple[Dict, float, bool]:
         if self.done:
             raise Exception("Episode has ended. Please reset the environment.")
 
+        # Draw this step's random decisions in one call
+        self.draws = self.rng.random(STEP_DRAWS).tolist()
+        self.draw_index = 0
+
         x, y = self.agent_pos
         if action == "up":
             x = max(x - 1, 0)
@@ -86,7 +301,7 @@ class GridWorld:
 
         # Update time and potentially weather
         self.update_time()
-        if random.random() < 0.1:  # 10% chance to change weather each step
+        if self.uniform() < 0.1:  # 10% chance to change weather each step
             self.update_weather()
 
         # Apply random environment changes
@@ -101,6 +316,7 @@ class GridWorld:
         elif self.steps >= 100:
             self.done = True  # Max steps to prevent infinite episodes
 
+        self.draws = []
         return self.get_state(), reward, self.done
 
     def update_time(self):
@@ -113,41 +329,38 @@ class GridWorld:
                 self.time["day"] += 1
 
     def update_weather(self):
-        weather_types = ["clear", "cloudy", "rainy", "stormy", "foggy"]
-        self.weather = random.choice(weather_types)
+        self.weather = self.choice(WEATHER_TYPES)
 
     def interact(self):
-        for npc_id, npc_data in self.npcs.items():
-            if npc_data["position"] == self.agent_pos:
-                self.events.append({"type": "dialogue", "content": npc_data["dialogue"]})
-                return
-        self.events.append({"type": "action", "content": "No one to interact with here."})
+        slot = self.npcs.at(self.agent_pos)
+        if slot >= 0:
+            self.add_event(ev.DIALOGUE, text=self.npcs.texts[slot])
+            return
+        self.add_event(ev.NO_INTERACTION)
 
     def use_item(self):
-        for item_id, item_data in list(self.items.items()):
-            if item_data["position"] == self.agent_pos:
-                self.events.append({"type": "item_use", "content": f"Used {item_data['type']}"})
-                del self.items[item_id]
-                return
-        self.events.append({"type": "action", "content": "No item to use here."})
+        slot = self.items.at(self.agent_pos)
+        if slot >= 0:
+            self.add_event(ev.ITEM_USE, a=int(self.items.kinds[slot]))
+            self.writable("items").remove(self.items.ids[slot])
+            return
+        self.add_event(ev.NO_ITEM)
 
     def calculate_reward(self):
         base_reward = -1  # Default step cost
-        terrain_rewards = {"grass": 0, "forest": -1, "mountain": -2, "water": -3, "desert": -2}
-        terrain_type = self.terrain[self.agent_pos[0]][self.agent_pos[1]]
-        return base_reward + terrain_rewards[terrain_type]
+        return base_reward + int(TERRAIN_REWARDS[self.terrain[self.agent_pos]])
 
     def check_events(self):
-        if random.random() < 0.05:  # 5% chance of a random event
+        if self.uniform() < 0.05:  # 5% chance of a random event
             event_types = ["discovery", "danger", "weather_change"]
-            event_type = random.choice(event_types)
+            event_type = self.choice(event_types)
             if event_type == "discovery":
-                self.events.append({"type": "discovery", "content": "You found a hidden path!"})
+                self.add_event(ev.DISCOVERY)
             elif event_type == "danger":
-                self.events.append({"type": "danger", "content": "A wild animal appears!"})
+                self.add_event(ev.DANGER)
             elif event_type == "weather_change":
                 self.update_weather()
-                self.events.append({"type": "weather", "content": f"Weather changed to {self.weather}"})
+                self.add_event(ev.WEATHER, a=WEATHER_TYPES.index(self.weather))
 
     def get_possible_actions(self) -> List[str]:
         actions = ["up", "down", "left", "right", "interact", "use_item"]
@@ -164,7 +377,7 @@ class GridWorld:
 
     def apply_environment_changes(self):
         change_types = ["terrain", "npc", "item", "weather", "event"]
-        change_type = random.choice(change_types)
+        change_type = self.choice(change_types)
 
         if change_type == "terrain":
             self.change_terrain()
@@ -178,69 +391,39 @@ class GridWorld:
             self.add_random_event()
 
     def change_terrain(self):
-        x, y = random.randint(0, self.size[0]-1), random.randint(0, self.size[1]-1)
-        new_terrain = random.choice(["grass", "forest", "mountain", "water", "desert"])
-        old_terrain = self.terrain[x][y]
-        self.terrain[x][y] = new_terrain
-        self.events.append({
-            "type": "terrain_change",
-            "content": f"Terrain at ({x}, {y}) changed from {old_terrain} to {new_terrain}"
-        })
+        x, y = self.random_position()
+        new_terrain = self.randint(0, len(TERRAIN_TYPES)-1)
+        old_terrain = self.terrain[x, y]
+        self.writable("terrain")[x, y] = new_terrain
+        self.add_event(ev.TERRAIN_CHANGE, x=x, y=y, a=int(old_terrain), b=new_terrain)
 
     def change_npcs(self):
-        if random.random() < 0.5 and self.npcs:  # 50% chance to remove an NPC if there are any
-            npc_id = random.choice(list(self.npcs.keys()))
-            del self.npcs[npc_id]
-            self.events.append({
-                "type": "npc_removed",
-                "content": f"NPC {npc_id} has left the area"
-            })
+        if self.uniform() < 0.5 and len(self.npcs):  # 50% chance to remove an NPC if there are any
+            npc_id = self.choice(list(self.npcs.slots))
+            self.writable("npcs").remove(npc_id)
+            self.add_event(ev.NPC_REMOVED, entity=entity_number(npc_id))
         else:  # Add a new NPC
             npc_id = f"NPC-{len(self.npcs)}"
-            self.npcs[npc_id] = {
-                "position": (random.randint(0, self.size[0]-1), random.randint(0, self.size[1]-1)),
-                "dialogue": f"Hello, I'm the new NPC {npc_id}!"
-            }
-            self.events.append({
-                "type": "npc_added",
-                "content": f"New NPC {npc_id} has appeared"
-            })
+            self.writable("npcs").add(npc_id, self.random_position(), text=f"Hello, I'm the new NPC {npc_id}!")
+            self.add_event(ev.NPC_ADDED, entity=entity_number(npc_id))
 
     def change_items(self):
-        if random.random() < 0.5 and self.items:  # 50% chance to remove an item if there are any
-            item_id = random.choice(list(self.items.keys()))
-            del self.items[item_id]
-            self.events.append({
-                "type": "item_removed",
-                "content": f"Item {item_id} has disappeared"
-            })
+        if self.uniform() < 0.5 and len(self.items):  # 50% chance to remove an item if there are any
+            item_id = self.choice(list(self.items.slots))
+            self.writable("items").remove(item_id)
+            self.add_event(ev.ITEM_REMOVED, entity=entity_number(item_id))
         else:  # Add a new item
             item_id = f"Item-{len(self.items)}"
-            self.items[item_id] = {
-                "position": (random.randint(0, self.size[0]-1), random.randint(0, self.size[1]-1)),
-                "type": random.choice(["weapon", "potion", "key", "treasure"]),
-                "value": random.randint(1, 100)
-            }
-            self.events.append({
-                "type": "item_added",
-                "content": f"New item {item_id} has appeared"
-            })
+            position = self.random_position()
+            self.writable("items").add(item_id, position, kind=self.randint(0, len(ITEM_TYPES)-1), value=self.randint(1, 100))
+            self.add_event(ev.ITEM_ADDED, entity=entity_number(item_id))
 
     def add_random_event(self):
         event_types = ["discovery", "danger", "quest"]
-        event_type = random.choice(event_types)
+        event_type = self.choice(event_types)
         if event_type == "discovery":
-            self.events.append({
-                "type": "discovery",
-                "content": "You found a hidden path!"
-            })
+            self.add_event(ev.DISCOVERY)
         elif event_type == "danger":
-            self.events.append({
-                "type": "danger",
-                "content": "A wild animal appears!"
-            })
+            self.add_event(ev.DANGER)
         elif event_type == "quest":
-            self.events.append({
-                "type": "quest",
-                "content": "A villager asks for your help to find a lost item."
-            })
+            self.add_event(ev.QUEST)
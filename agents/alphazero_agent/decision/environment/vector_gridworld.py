@@ -0,0 +1,154 @@
+# environment/vector_gridworld.py
+
+import numpy as np
+from typing import Tuple, Optional
+
+from .constants import TERRAIN_TYPES, WEATHER_TYPES, TERRAIN_REWARDS
+from .encoding import NUM_CHANNELS
+
+ACTIONS = ["up", "down", "left", "right", "interact", "use_item"]
+ACTION_INDEX = {action: i for i, action in enumerate(ACTIONS)}
+
+# Row/column offsets per action index; interact and use_item do not move
+MOVES = np.array([[-1, 0], [1, 0], [0, -1], [0, 1], [0, 0], [0, 0]], dtype=np.int32)
+
+NUM_CHANGE_TYPES = 5  # terrain, npc, item, weather, event
+
+class VectorGridWorld:
+    """
+    N GridWorlds stepped together as stacked arrays.
+
+    Follows GridWorld's rules with NPCs and items tracked as per-cell counts
+    and no event log. `step` takes one action index (into ACTIONS) per
+    environment and automatically resets environments that finish, so the
+    returned observations always belong to live episodes. Observations use
+    the StateEncoder layout, (N, 6, H, W) float32, and can be passed to the
+    network as is.
+    """
+    def __init__(self, num_envs: int, size: Tuple[int, int]=(10, 10), start: Tuple[int, int]=(0, 0),
+                 goal: Tuple[int, int]=(9, 9), max_steps: int=100, seed: Optional[int]=None):
+        self.num_envs = num_envs
+        self.size = size
+        self.start = start
+        self.goal = goal
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+
+        n, h, w = num_envs, size[0], size[1]
+        self.terrain = np.zeros((n, h, w), dtype=np.uint8)
+        self.npc_count = np.zeros((n, h, w), dtype=np.uint8)
+        self.item_count = np.zeros((n, h, w), dtype=np.uint8)
+        self.agent_pos = np.zeros((n, 2), dtype=np.int32)
+        self.weather = np.zeros(n, dtype=np.uint8)
+        self.minutes = np.zeros(n, dtype=np.int32)
+        self.steps = np.zeros(n, dtype=np.int32)
+        self.observations = np.zeros((n, NUM_CHANNELS, h, w), dtype=np.float32)
+        self.env_index = np.arange(n)
+
+    def reset(self) -> np.ndarray:
+        self.reset_envs(self.env_index)
+        return self.observe()
+
+    def reset_envs(self, envs: np.ndarray):
+        k = len(envs)
+        if k == 0:
+            return
+        h, w = self.size
+        self.terrain[envs] = self.rng.integers(len(TERRAIN_TYPES), size=(k, h, w), dtype=np.uint8)
+        self.npc_count[envs] = 0
+        self.item_count[envs] = 0
+        self.scatter(self.npc_count, np.repeat(envs, 3))  # 3 NPCs
+        self.scatter(self.item_count, np.repeat(envs, 5))  # 5 items
+        self.agent_pos[envs] = self.start
+        self.weather[envs] = 0
+        self.minutes[envs] = 12 * 60
+        self.steps[envs] = 0
+
+    def scatter(self, counts: np.ndarray, envs: np.ndarray):
+        # Adds one entity at a random cell of each listed environment
+        rows = self.rng.integers(self.size[0], size=len(envs))
+        cols = self.rng.integers(self.size[1], size=len(envs))
+        np.add.at(counts, (envs, rows, cols), 1)
+
+    def remove_random(self, counts: np.ndarray, envs: np.ndarray):
+        # Removes one uniformly chosen entity from each listed environment
+        if len(envs) == 0:
+            return
+        flat = counts[envs].reshape(len(envs), -1)
+        cumulative = np.cumsum(flat, axis=1)
+        picks = (self.rng.random(len(envs)) * cumulative[:, -1]).astype(np.int64)
+        cells = (cumulative <= picks[:, None]).sum(axis=1)
+        rows, cols = np.divmod(cells, self.size[1])
+        counts[envs, rows, cols] -= 1
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        actions = np.asarray(actions)
+        n = self.num_envs
+        envs = self.env_index
+
+        # Movement, clamped to the grid
+        self.agent_pos += MOVES[actions]
+        np.clip(self.agent_pos, 0, np.array(self.size) - 1, out=self.agent_pos)
+        rows, cols = self.agent_pos[:, 0], self.agent_pos[:, 1]
+
+        # use_item consumes one item on the agent's cell
+        using = (actions == ACTION_INDEX["use_item"]) & (self.item_count[envs, rows, cols] > 0)
+        self.item_count[envs[using], rows[using], cols[using]] -= 1
+
+        self.steps += 1
+        self.minutes += 5
+
+        # All per-step random decisions in one draw
+        draws = self.rng.random((n, 4))
+        change_weather = draws[:, 0] < 0.1
+        change_type = (draws[:, 1] * NUM_CHANGE_TYPES).astype(np.int64)
+        remove = draws[:, 2] < 0.5
+        event = draws[:, 3] < 0.05
+
+        self.weather[change_weather] = self.rng.integers(len(WEATHER_TYPES), size=change_weather.sum())
+
+        changed = envs[change_type == 0]
+        self.terrain[changed, self.rng.integers(self.size[0], size=len(changed)),
+                     self.rng.integers(self.size[1], size=len(changed))] = self.rng.integers(len(TERRAIN_TYPES), size=len(changed))
+        for kind, counts in ((1, self.npc_count), (2, self.item_count)):
+            selected = change_type == kind
+            has_any = counts.reshape(n, -1).any(axis=1)
+            self.remove_random(counts, envs[selected & remove & has_any])
+            self.scatter(counts, envs[selected & ~(remove & has_any)])
+        weather = envs[change_type == 3]
+        self.weather[weather] = self.rng.integers(len(WEATHER_TYPES), size=len(weather))
+
+        rewards = -1 + TERRAIN_REWARDS[self.terrain[envs, rows, cols]]
+
+        # A third of the random events are weather changes
+        weather_events = envs[event & (self.rng.integers(3, size=n) == 2)]
+        self.weather[weather_events] = self.rng.integers(len(WEATHER_TYPES), size=len(weather_events))
+
+        at_goal = (rows == self.goal[0]) & (cols == self.goal[1])
+        rewards = rewards + 100 * at_goal
+        dones = at_goal | (self.steps >= self.max_steps)
+
+        self.reset_envs(envs[dones])
+        return self.observe(), rewards.astype(np.float32), dones
+
+    def action_mask(self) -> np.ndarray:
+        # (N, len(ACTIONS)) legal actions, matching GridWorld.get_possible_actions
+        mask = np.ones((self.num_envs, len(ACTIONS)), dtype=bool)
+        mask[:, ACTION_INDEX["up"]] = self.agent_pos[:, 0] > 0
+        mask[:, ACTION_INDEX["down"]] = self.agent_pos[:, 0] < self.size[0] - 1
+        mask[:, ACTION_INDEX["left"]] = self.agent_pos[:, 1] > 0
+        mask[:, ACTION_INDEX["right"]] = self.agent_pos[:, 1] < self.size[1] - 1
+        return mask
+
+    def observe(self) -> np.ndarray:
+        # Written into a reusable buffer; copy before the next step if kept
+        out = self.observations
+        envs = self.env_index
+        out[:, 0] = self.terrain
+        out[:, 1:3] = 0
+        out[envs, 1, self.agent_pos[:, 0], self.agent_pos[:, 1]] = 1
+        out[:, 2, self.goal[0], self.goal[1]] = 1
+        out[:, 3] = self.npc_count > 0
+        out[:, 4] = self.item_count > 0
+        out[:, 5] = (self.weather / len(WEATHER_TYPES))[:, None, None]
+        return out
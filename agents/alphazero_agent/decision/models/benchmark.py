@@ -0,0 +1,88 @@
+# models/benchmark.py
+
+"""
+Compares AlphaZeroNetwork with FullyConvolutionalNetwork across grid sizes.
+
+Run from agents/alphazero_agent with `python -m decision.models.benchmark`.
+Reports parameter count, weight and activation memory, and single-state
+inference latency. AlphaZeroNetwork is only built while its weights fit
+under `--max-weight-mb`; larger sizes report the computed parameter count.
+"""
+
+import argparse
+import time
+from typing import Dict, Tuple
+import torch
+import torch.nn as nn
+
+from .network import AlphaZeroNetwork, FullyConvolutionalNetwork
+
+def dense_parameter_count(grid_size: Tuple[int, int], num_actions: int) -> int:
+    # AlphaZeroNetwork's parameters without building it: the fc1 layer dominates
+    convs = (6 * 9 + 1) * 32 + (32 * 9 + 1) * 64 + (64 * 9 + 1) * 64
+    batch_norms = 2 * (32 + 64 + 64)
+    fc1 = (64 * grid_size[0] * grid_size[1] + 1) * 256
+    heads = 257 * num_actions + 257
+    return convs + batch_norms + fc1 + heads
+
+def activation_bytes(network: nn.Module, x: torch.Tensor) -> int:
+    # Sum of every module output of one forward pass
+    total = 0
+    def record(module, inputs, output):
+        nonlocal total
+        for tensor in output if isinstance(output, tuple) else (output,):
+            total += tensor.numel() * tensor.element_size()
+    hooks = [module.register_forward_hook(record) for module in network.modules() if module is not network]
+    with torch.no_grad():
+        network(x)
+    for hook in hooks:
+        hook.remove()
+    return total
+
+def latency(network: nn.Module, x: torch.Tensor, repeats: int) -> float:
+    for _ in range(3):
+        network.predict(x)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        network.predict(x)
+    return (time.perf_counter() - start) / repeats
+
+def benchmark(network: nn.Module, grid_size: Tuple[int, int], repeats: int) -> Dict[str, float]:
+    network.eval()
+    x = torch.zeros(1, 6, *grid_size)
+    x[0, 1, 0, 0] = 1  # agent
+    parameters = sum(p.numel() for p in network.parameters())
+    return {
+        "parameters": parameters,
+        "weights_mb": parameters * 4 / 2**20,
+        "activations_mb": activation_bytes(network, x) / 2**20,
+        "latency_ms": latency(network, x, repeats) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 64, 256])
+    parser.add_argument("--num-actions", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--max-weight-mb", type=float, default=1024)
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    print(f"{'network':<26}{'grid':>10}{'params':>14}{'weights MB':>12}{'activ. MB':>12}{'latency ms':>12}")
+    for size in args.sizes:
+        grid_size = (size, size)
+        rows = []
+        dense_parameters = dense_parameter_count(grid_size, args.num_actions)
+        if dense_parameters * 4 / 2**20 <= args.max_weight_mb:
+            rows.append(("AlphaZeroNetwork", benchmark(AlphaZeroNetwork(grid_size, args.num_actions), grid_size, args.repeats)))
+        else:
+            rows.append(("AlphaZeroNetwork", {"parameters": dense_parameters, "weights_mb": dense_parameters * 4 / 2**20}))
+        rows.append(("FullyConvolutionalNetwork",
+                     benchmark(FullyConvolutionalNetwork(args.num_actions), grid_size, args.repeats)))
+        for name, result in rows:
+            activations = f"{result['activations_mb']:>12.2f}" if "activations_mb" in result else f"{'-':>12}"
+            timing = f"{result['latency_ms']:>12.2f}" if "latency_ms" in result else f"{'skipped':>12}"
+            print(f"{name:<26}{f'{size}x{size}':>10}{result['parameters']:>14,}{result['weights_mb']:>12.1f}{activations}{timing}")
+
+if __name__ == "__main__":
+    main()
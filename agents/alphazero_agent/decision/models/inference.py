@@ -0,0 +1,89 @@
+# models/inference.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Tuple
+import numpy as np
+import torch
+
+class InferenceServer:
+    """
+    Evaluates states for many searches with one network, either an
+    AlphaZeroNetwork or its export_inference() copy. Requests from all
+    callers are queued and a background thread runs them through the network
+    in batches of up to `max_batch_size`, waiting at most `max_wait` seconds
+    after the first request for more to arrive. Results come back as futures
+    of (policy probabilities, value).
+    """
+    def __init__(self, network, max_batch_size: int=64, max_wait: float=0.002):
+        self.network = network
+        self.network.eval()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.batch = None
+        # Counters for sizing max_batch_size and max_wait
+        self.batches = 0
+        self.evaluated = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, state: np.ndarray) -> Future:
+        future = Future()
+        # Callers may reuse their input buffer as soon as this returns
+        self.requests.put((np.array(state, dtype=np.float32), future))
+        return future
+
+    def evaluate(self, states: List[np.ndarray]) -> Tuple[np.ndarray, List[float]]:
+        # Same result shape as MCTS.forward, so a search can use the server in its place
+        results = [future.result() for future in [self.submit(state) for state in states]]
+        return np.stack([policy for policy, _ in results]), [value for _, value in results]
+
+    def collect(self) -> list:
+        # Blocks for the first request, then gathers more until the batch is full or the wait is over
+        pending = [self.requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(pending) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = self.requests.get(timeout=timeout) if timeout > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            pending.append(request)
+        return pending
+
+    def run(self):
+        while True:
+            pending = self.collect()
+            stop = any(request is None for request in pending)
+            pending = [request for request in pending if request is not None and request[1].set_running_or_notify_cancel()]
+            if pending:
+                self.process(pending)
+            if stop:
+                return
+
+    def process(self, pending: list):
+        n = len(pending)
+        shape = pending[0][0].shape
+        if self.batch is None or self.batch.shape[1:] != shape:
+            self.batch = np.empty((self.max_batch_size,) + shape, dtype=np.float32)
+        try:
+            for i, (state, _) in enumerate(pending):
+                self.batch[i] = state
+            policy, value = self.network.predict(torch.from_numpy(self.batch[:n]))
+            policies = policy.numpy()
+            values = value.tolist()
+        except Exception as error:
+            for _, future in pending:
+                future.set_exception(error)
+            return
+        for i, (_, future) in enumerate(pending):
+            future.set_result((policies[i], values[i]))
+        self.batches += 1
+        self.evaluated += n
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
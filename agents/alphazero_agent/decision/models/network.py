@@ -1,17 +1,22 @@
 # models/network.py
 
+import copy
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from torch.ao.quantization import quantize_dynamic
+from torch.nn.utils.fusion import fuse_conv_bn_eval
 from typing import Tuple
 
+AGENT_CHANNEL = 1  # StateEncoder channel marking the agent's cell
+
 class AlphaZeroNetwork(nn.Module):
-    def __init__(self, input_shape: Tuple[int, int], num_actions: int):
+    def __init__(self, input_shape: Tuple[int, int], num_actions: int, in_channels: int=6):
         super(AlphaZeroNetwork, self).__init__()
         self.input_shape = input_shape
         self.num_actions = num_actions
 
-        self.conv1 = nn.Conv2d(6, 32, kernel_size=3, padding=1)
+        self.conv1 = nn.Conv2d(in_channels, 32, kernel_size=3, padding=1)
         self.conv2 = nn.Conv2d(32, 64, kernel_size=3, padding=1)
         self.conv3 = nn.Conv2d(64, 64, kernel_size=3, padding=1)
         
@@ -32,3 +37,109 @@ class AlphaZeroNetwork(nn.Module):
         policy = self.fc_policy(x)
         value = self.fc_value(x)
         return policy, value
+
+    def predict(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        # Policy probabilities and values without recording gradients
+        with torch.no_grad():
+            policy, value = self(x)
+        return torch.softmax(policy, dim=1), value[:, 0]
+
+    def export_inference(self, quantize: bool=False, script: bool=True) -> nn.Module:
+        """
+        Returns an inference-only copy of this network with BatchNorm folded
+        into the convolutions, compiled with TorchScript unless `script` is
+        False. With `quantize`, fc1 gets int8 dynamic quantization. Later
+        changes to this network's weights do not reach the copy.
+
+        The copy can search in place of this network, e.g. as the `network`
+        of an AlphaZeroAgent or an InferenceServer, but cannot be trained.
+        Root-parallel MCTS workers load it from a TorchScript file.
+        """
+        network = InferenceNetwork(self, quantize)
+        return torch.jit.script(network) if script else network
+
+class InferenceNetwork(nn.Module):
+    def __init__(self, network: AlphaZeroNetwork, quantize: bool=False):
+        super(InferenceNetwork, self).__init__()
+        self.input_shape = network.input_shape
+        self.num_actions = network.num_actions
+        network = copy.deepcopy(network).eval()
+        self.conv1 = fuse_conv_bn_eval(network.conv1, network.bn1)
+        self.conv2 = fuse_conv_bn_eval(network.conv2, network.bn2)
+        self.conv3 = fuse_conv_bn_eval(network.conv3, network.bn3)
+        self.fc1 = network.fc1
+        if quantize:
+            # The largest layer by far; the convolutions stay in float
+            self.fc1 = quantize_dynamic(nn.Sequential(self.fc1), {nn.Linear}, dtype=torch.qint8)[0]
+        self.fc_policy = network.fc_policy
+        self.fc_value = network.fc_value
+        self.eval()
+        self.requires_grad_(False)
+
+    def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        x = F.relu(self.conv1(x))
+        x = F.relu(self.conv2(x))
+        x = F.relu(self.conv3(x))
+        x = x.view(x.size(0), -1)
+        x = F.relu(self.fc1(x))
+        return self.fc_policy(x), self.fc_value(x)
+
+    @torch.jit.export
+    def predict(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        with torch.no_grad():
+            policy, value = self.forward(x)
+        return torch.softmax(policy, dim=1), value[:, 0]
+
+class FullyConvolutionalNetwork(nn.Module):
+    """
+    Variant of AlphaZeroNetwork whose weights do not depend on the grid size.
+    The convolutional trunk is followed by a pooled summary instead of a
+    dense layer over every cell: the features at the agent's cell (a local
+    crop of the trunk's receptive field) plus their global average and max.
+    Parameters stay constant and cost grows only with the convolutions.
+    """
+    def __init__(self, num_actions: int, in_channels: int=6, input_shape: Tuple[int, int]=None):
+        super(FullyConvolutionalNetwork, self).__init__()
+        # Kept for compatibility with AlphaZeroNetwork; any grid size is accepted
+        self.input_shape = input_shape
+        self.num_actions = num_actions
+        self.agent_channel = AGENT_CHANNEL
+
+        self.conv1 = nn.Conv2d(in_channels, 32, kernel_size=3, padding=1)
+        self.conv2 = nn.Conv2d(32, 64, kernel_size=3, padding=1)
+        self.conv3 = nn.Conv2d(64, 64, kernel_size=3, padding=1)
+
+        self.bn1 = nn.BatchNorm2d(32)
+        self.bn2 = nn.BatchNorm2d(64)
+        self.bn3 = nn.BatchNorm2d(64)
+
+        self.fc1 = nn.Linear(3 * 64, 256)
+        self.fc_policy = nn.Linear(256, num_actions)
+        self.fc_value = nn.Linear(256, 1)
+
+    def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        agent = x[:, self.agent_channel:self.agent_channel + 1]
+        x = F.relu(self.bn1(self.conv1(x)))
+        x = F.relu(self.bn2(self.conv2(x)))
+        x = F.relu(self.bn3(self.conv3(x)))
+        local = (x * agent).sum(dim=(2, 3))
+        x = torch.cat([local, x.mean(dim=(2, 3)), x.amax(dim=(2, 3))], dim=1)
+        x = F.relu(self.fc1(x))
+        policy = self.fc_policy(x)
+        value = self.fc_value(x)
+        return policy, value
+
+    @torch.jit.export
+    def predict(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        with torch.no_grad():
+            policy, value = self.forward(x)
+        return torch.softmax(policy, dim=1), value[:, 0]
+
+    def export_inference(self, script: bool=True) -> nn.Module:
+        # BatchNorm folded into the convolutions; there is no large dense layer worth quantizing
+        network = copy.deepcopy(self).eval()
+        for conv, bn in (("conv1", "bn1"), ("conv2", "bn2"), ("conv3", "bn3")):
+            setattr(network, conv, fuse_conv_bn_eval(getattr(network, conv), getattr(network, bn)))
+            setattr(network, bn, nn.Identity())
+        network.requires_grad_(False)
+        return torch.jit.script(network) if script else network
@@ -0,0 +1,264 @@
+# search/array_tree.py
+
+import math
+from typing import Dict, List, Optional
+import numpy as np
+
+from .mcts import MCTS
+
+class ArrayTree:
+    """
+    MCTS tree stored in preallocated NumPy arrays instead of TreeNode objects.
+
+    Nodes are integer indices. The children of a node occupy a contiguous
+    block starting at `first_child[node]`, so PUCT scores for all children are
+    computed with one vectorized expression. Actions are stored as indices
+    into `actions`. The arrays double in size when they run out of room.
+    """
+    def __init__(self, capacity: int=4096):
+        self.actions = []
+        self.action_index = {}
+        self.allocate(capacity)
+
+    def allocate(self, capacity: int):
+        self.capacity = capacity
+        self.visit_count = np.zeros(capacity, dtype=np.int32)
+        self.value_sum = np.zeros(capacity, dtype=np.float64)
+        self.prior = np.ones(capacity, dtype=np.float32)
+        self.reward = np.zeros(capacity, dtype=np.float32)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.num_children = np.zeros(capacity, dtype=np.int32)
+        self.action = np.full(capacity, -1, dtype=np.int32)
+        # States of the nodes whose state is known, by node index
+        self.states = {}
+        self.size = 0
+
+    def clear(self):
+        self.visit_count[:self.size] = 0
+        self.value_sum[:self.size] = 0
+        self.prior[:self.size] = 1
+        self.reward[:self.size] = 0
+        self.parent[:self.size] = -1
+        self.first_child[:self.size] = -1
+        self.num_children[:self.size] = 0
+        self.action[:self.size] = -1
+        self.states = {}
+        self.size = 0
+
+    def grow(self, min_capacity: int):
+        capacity = self.capacity
+        while capacity < min_capacity:
+            capacity *= 2
+        for name in ("visit_count", "value_sum", "prior", "reward", "parent", "first_child", "num_children", "action"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            new[self.size:] = {"prior": 1, "parent": -1, "first_child": -1, "action": -1}.get(name, 0)
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def action_id(self, action: str) -> int:
+        index = self.action_index.get(action)
+        if index is None:
+            index = self.action_index[action] = len(self.actions)
+            self.actions.append(action)
+        return index
+
+    def add_root(self, state) -> int:
+        self.clear()
+        self.size = 1
+        self.states[0] = state
+        return 0
+
+    def expand(self, node: int, actions: List[str], priors: Optional[np.ndarray]=None):
+        n = len(actions)
+        if self.size + n > self.capacity:
+            self.grow(self.size + n)
+        start = self.size
+        end = start + n
+        self.parent[start:end] = node
+        self.action[start:end] = [self.action_id(action) for action in actions]
+        self.prior[start:end] = 1.0 if priors is None else priors
+        self.reward[start:end] = 0
+        self.first_child[node] = start
+        self.num_children[node] = n
+        self.size = end
+
+    def select_child(self, node: int, c_puct: float) -> int:
+        # PUCT over the whole contiguous block of children at once
+        start = self.first_child[node]
+        end = start + self.num_children[node]
+        visits = self.visit_count[start:end]
+        q = self.value_sum[start:end] / np.maximum(visits, 1)
+        u = c_puct * self.prior[start:end] * math.sqrt(self.visit_count[node]) / (1 + visits)
+        return start + int(np.argmax(q + u))
+
+    def child(self, node: int, action: str) -> int:
+        index = self.action_index.get(action)
+        start = self.first_child[node]
+        if index is None or start < 0:
+            return -1
+        matches = np.flatnonzero(self.action[start:start + self.num_children[node]] == index)
+        return start + int(matches[0]) if len(matches) else -1
+
+    def children(self, node: int) -> Dict[str, int]:
+        start = self.first_child[node]
+        if start < 0:
+            return {}
+        end = start + self.num_children[node]
+        return {self.actions[a]: c for a, c in zip(self.action[start:end].tolist(), range(start, end))}
+
+    def path(self, node: int) -> np.ndarray:
+        path = []
+        while node >= 0:
+            path.append(node)
+            node = self.parent[node]
+        return np.array(path, dtype=np.int32)
+
+    def compact(self, root: int):
+        """
+        Moves the subtree under `root` to the front of the arrays, with `root`
+        at index 0. Breadth-first order keeps child blocks contiguous.
+        """
+        order = [root]
+        i = 0
+        while i < len(order):
+            node = order[i]
+            i += 1
+            start = self.first_child[node]
+            if start >= 0:
+                order.extend(range(start, start + self.num_children[node]))
+        old = np.array(order, dtype=np.int32)
+        remap = np.full(self.size, -1, dtype=np.int32)
+        remap[old] = np.arange(len(old), dtype=np.int32)
+
+        n = len(old)
+        visit_count = self.visit_count[old]
+        value_sum = self.value_sum[old]
+        prior = self.prior[old]
+        reward = self.reward[old]
+        parent = self.parent[old]
+        first_child = self.first_child[old]
+        num_children = self.num_children[old]
+        action = self.action[old]
+        states = {int(remap[k]): v for k, v in self.states.items() if remap[k] >= 0}
+
+        self.clear()
+        self.visit_count[:n] = visit_count
+        self.value_sum[:n] = value_sum
+        self.prior[:n] = prior
+        self.reward[:n] = reward
+        self.reward[0] = 0
+        self.parent[:n] = np.where(parent >= 0, remap[parent], -1)
+        self.parent[0] = -1
+        self.first_child[:n] = np.where(first_child >= 0, remap[first_child], -1)
+        self.num_children[:n] = num_children
+        self.action[:n] = action
+        self.states = states
+        self.size = n
+
+class ArrayMCTS(MCTS):
+    """
+    MCTS over an ArrayTree. Supports the same options as MCTS; nodes are
+    integer indices into the tree arrays and the root is always node 0.
+    """
+    def __init__(self, network, tree_capacity=4096, **kwargs):
+        super().__init__(network, **kwargs)
+        self.tree = ArrayTree(tree_capacity)
+
+    def new_root(self, state, possible_actions):
+        self.root = self.tree.add_root(np.copy(state))
+        self.tree.expand(self.root, possible_actions, self.root_priors(state, possible_actions))
+        if self.root_noise is not None:
+            self.add_root_noise(self.root_noise)
+
+    def spawn_worker(self):
+        worker = super().spawn_worker()
+        worker.tree = ArrayTree(self.tree.capacity)
+        return worker
+
+    def add_root_noise(self, rng: np.random.Generator):
+        start = self.tree.first_child[self.root]
+        end = start + self.tree.num_children[self.root]
+        noise = rng.dirichlet([self.dirichlet_alpha] * (end - start))
+        self.tree.prior[start:end] = (1 - self.noise_fraction) * self.tree.prior[start:end] + self.noise_fraction * noise
+
+    def root_state(self):
+        return self.tree.states.get(self.root)
+
+    def root_visits(self) -> Dict[str, int]:
+        return {action: int(self.tree.visit_count[child]) for action, child in self.tree.children(self.root).items()}
+
+    def reuse_root(self, possible_actions):
+        children = self.tree.children(self.root)
+        if list(children) == list(possible_actions):
+            return
+        # Rebuild the root's child block for the current legal actions, keeping known subtrees
+        old_children = {action: child for action, child in children.items() if action in possible_actions}
+        self.tree.expand(self.root, possible_actions)
+        for action, child in self.tree.children(self.root).items():
+            old = old_children.get(action)
+            if old is None:
+                continue
+            for name in ("visit_count", "value_sum", "prior", "reward", "first_child", "num_children"):
+                getattr(self.tree, name)[child] = getattr(self.tree, name)[old]
+            start = self.tree.first_child[child]
+            if start >= 0:
+                self.tree.parent[start:start + self.tree.num_children[child]] = child
+            if old in self.tree.states:
+                self.tree.states[child] = self.tree.states.pop(old)
+
+    def advance(self, action, state):
+        child = self.tree.child(self.root, action) if self.root is not None else -1
+        known = self.tree.states.get(child)
+        if child < 0 or known is None or not np.array_equal(known, state):
+            self.root = None
+            return
+        self.tree.states[child] = np.copy(state)
+        self.tree.compact(child)
+        self.root = 0
+
+    def select_leaf(self) -> int:
+        node = self.root
+        while self.tree.num_children[node] > 0:
+            node = self.tree.select_child(node, self.c_puct)
+        return node
+
+    def select_child(self, node: int):
+        child = self.tree.select_child(node, self.c_puct)
+        return self.tree.actions[self.tree.action[child]], child
+
+    def set_reward(self, node: int, reward: float):
+        self.tree.reward[node] = reward * self.reward_scale
+
+    def set_state(self, node: int, state):
+        if node not in self.tree.states:
+            self.tree.states[node] = state
+
+    def is_leaf(self, node: int) -> bool:
+        return self.tree.num_children[node] == 0
+
+    def expand(self, node: int, actions: List[str], priors=None):
+        self.tree.expand(node, actions, priors)
+
+    def add_virtual_loss(self, node: int):
+        path = self.tree.path(node)
+        self.tree.visit_count[path] += self.virtual_loss
+        self.tree.value_sum[path] -= self.virtual_loss
+
+    def revert_virtual_loss(self, node: int):
+        path = self.tree.path(node)
+        self.tree.visit_count[path] -= self.virtual_loss
+        self.tree.value_sum[path] += self.virtual_loss
+
+    def backpropagate(self, node: int, value: float):
+        path = self.tree.path(node)
+        # Discounted returns from each node's incoming edge onwards, leaf first
+        if self.discount == 1:
+            values = value + np.cumsum(self.tree.reward[path], dtype=np.float64)
+        else:
+            powers = self.discount ** np.arange(len(path), dtype=np.float64)
+            values = powers * (np.cumsum(self.tree.reward[path] / powers) + self.discount * value)
+        self.tree.visit_count[path] += 1
+        self.tree.value_sum[path] += values
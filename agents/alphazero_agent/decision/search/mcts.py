@@ -1,10 +1,19 @@
 # search/mcts.py
 
+import copy
 import math
-from typing import Tuple
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Tuple
 import numpy as np
 import torch
 
+from ..models.network import InferenceNetwork
+from .transposition import TranspositionTable, state_key
+
 class TreeNode:
     def __init__(self, state, parent=None, prior=1.0):
         self.state = state
@@ -13,13 +22,16 @@ class TreeNode:
         self.visit_count = 0
         self.value_sum = 0
         self.prior = prior
+        # Reward observed on the edge into this node when searching with a model
+        self.reward = 0
 
     def is_leaf(self):
         return len(self.children) == 0
 
-    def expand(self, actions):
-        for action in actions:
-            self.children[action] = TreeNode(state=None, parent=self, prior=1.0)
+    def expand(self, actions, priors=None):
+        for i, action in enumerate(actions):
+            prior = 1.0 if priors is None else float(priors[i])
+            self.children[action] = TreeNode(state=None, parent=self, prior=prior)
 
     def value(self):
         if self.visit_count == 0:
@@ -27,45 +39,355 @@ class TreeNode:
         return self.value_sum / self.visit_count
 
 class MCTS:
-    def __init__(self, network, c_puct=1.4, num_simulations=100):
+    def __init__(self, network, c_puct=1.4, num_simulations=100, eval_batch_size=1, virtual_loss=1, table_size=100000, reuse_tree=False,
+                 num_workers=1, parallel="leaf", dirichlet_alpha=0.3, noise_fraction=0.25,
+                 action_space=None, encoder=None, evaluator=None, seed=None, discount=1.0, reward_scale=1.0):
         self.network = network
         self.c_puct = c_puct
         self.num_simulations = num_simulations
-        self.Q = {}
-        self.N = {}
-        self.P = {}
+        # Number of leaves gathered before a single batched forward pass
+        self.eval_batch_size = eval_batch_size
+        self.virtual_loss = virtual_loss
+        # Network evaluations shared across search calls; disabled when table_size is 0
+        self.table = TranspositionTable(table_size) if table_size else None
+        # Keep the subtree of the played action as the next root, see advance()
+        self.reuse_tree = reuse_tree
+        # "root": independent searches in a process pool, merged by visit counts
+        # "leaf": threads descending one shared tree, with virtual loss
+        self.num_workers = num_workers
+        self.parallel = parallel
+        # Root noise that keeps root-parallel workers from building identical trees
+        self.dirichlet_alpha = dirichlet_alpha
+        self.noise_fraction = noise_fraction
+        self.root_noise = None
+        # Actions in the order of the network's policy outputs; without it all priors are 1.0
+        self.action_space = action_space
+        self.action_index = {action: i for i, action in enumerate(action_space or [])}
+        # Turns a model's get_state() into network input when searching with a model
+        self.encoder = encoder
+        # Observed rewards are multiplied by reward_scale, into the units of the network's value,
+        # and each simulated step discounts the value behind it
+        self.discount = discount
+        self.reward_scale = reward_scale
+        # Shared batching evaluator, e.g. an InferenceServer, used instead of calling the network directly
+        self.evaluator = evaluator
+        # Scratch copy of the model, restored from a snapshot at the start of every simulation
+        # and then reseeded from this sequence, so simulations neither replay the model's own
+        # upcoming random draws nor all share the same ones
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.scratch = None
+        self.scratch_snapshot = None
+        self.pool = None
+        # Shared-memory weights of the root-parallel workers and their version, see weights_changed()
+        self.shared_network = None
+        self.weights_version = None
         self.root = None
+        self.visits = {}
+
+    def search(self, state, possible_actions, model=None):
+        """
+        Returns the most visited action from `state`.
+
+        Without a `model`, every leaf is evaluated on `state` itself. With a
+        GridWorld `model` in that state, each simulation steps a copy of it
+        along the selected path, so leaves are evaluated on the states they
+        actually reach and the observed rewards are backed up with the value.
+        """
+        if self.num_workers > 1 and self.parallel == "root":
+            return self.search_root_parallel(state, possible_actions, model)
+
+        if self.reuse_tree and self.root is not None and np.array_equal(self.root_state(), state):
+            self.reuse_root(possible_actions)
+        else:
+            self.new_root(state, possible_actions)
 
-    def search(self, state, possible_actions):
-        self.root = TreeNode(state)
-        self.root.expand(possible_actions)
+        if model is not None:
+            self.scratch = model.clone()
+            self.scratch_snapshot = self.scratch.snapshot()
 
-        for _ in range(self.num_simulations):
-            node = self.root
-            path = []
-            while not node.is_leaf():
-                # Select the best action
-                best_action, best_value = self.select(node)
-                node = node.children[best_action]
-                path.append(best_action)
+        if self.num_workers > 1 and self.parallel == "leaf":
+            self.search_leaf_parallel(state, possible_actions, model)
+        elif self.eval_batch_size > 1:
+            self.search_batched(state, possible_actions, model)
+        else:
+            for _ in range(self.num_simulations):
+                node, leaf_state, actions = self.descend(state, possible_actions, model)
 
-            # Evaluate the leaf node
-            policy, value = self.network(state_tensor(state))
-            policy = torch.exp(policy).detach().numpy()[0]
-            value = value.item()
+                # Evaluate the leaf node
+                (policy, value), = self.evaluate_leaves([leaf_state])
 
-            # Expand the node
-            actions = possible_actions  # Assuming all actions are possible
-            node.expand(actions)
+                # Expand the node and propagate the value back up the path
+                self.complete(node, leaf_state, actions, policy, value)
 
-            # Propagate the value back up the path
-            self.backpropagate(node, value)
+        self.scratch = None
+        self.scratch_snapshot = None
 
         # Choose the action with the highest visit count
-        action_visits = {action: child.visit_count for action, child in self.root.children.items()}
-        best_action = max(action_visits, key=action_visits.get)
+        self.visits = self.root_visits()
+        best_action = max(self.visits, key=self.visits.get)
+        return best_action
+
+    def search_root_parallel(self, state, possible_actions, model=None):
+        """
+        Splits the simulations over `num_workers` processes, each searching
+        its own tree with differently seeded root noise, and plays the action
+        with the most visits summed over all workers.
+
+        The workers are started once and keep their search and transposition
+        table between calls; only the state and the model are sent per call.
+        """
+        if self.pool is None:
+            self.start_root_pool()
+        shares = [self.num_simulations // self.num_workers + (i < self.num_simulations % self.num_workers)
+                  for i in range(self.num_workers)]
+        # Children of the search's own sequence, so a seeded search is reproducible
+        seeds = self.seed_sequence.spawn(self.num_workers)
+        futures = [self.pool.submit(root_search_worker, share, seed, state, possible_actions, model)
+                   for share, seed in zip(shares, seeds)]
+
+        self.visits = dict.fromkeys(possible_actions, 0)
+        for future in futures:
+            for action, count in future.result().items():
+                self.visits[action] += count
+        # Each worker owns its tree, so there is no merged subtree to reuse
+        self.root = None
+        best_action = max(self.visits, key=self.visits.get)
         return best_action
 
+    def start_root_pool(self):
+        # The weights travel once, in shared memory, when each worker process starts
+        context = multiprocessing.get_context("spawn")
+        if isinstance(self.network, (torch.jit.ScriptModule, InferenceNetwork)):
+            # export_inference() networks cannot be pickled or shared; workers load them from a TorchScript file
+            fd, self.shared_network = tempfile.mkstemp(suffix=".pt")
+            os.close(fd)
+            save_worker_network(self.network, self.shared_network)
+        else:
+            self.shared_network = copy.deepcopy(self.network).share_memory()
+        self.weights_version = context.Value("i", 0)
+        self.pool = ProcessPoolExecutor(self.num_workers, mp_context=context, initializer=init_root_worker,
+                                        initargs=(self.spawn_worker(), self.shared_network, self.weights_version))
+
+    def spawn_worker(self):
+        # Serial copy of this search, without the network, to be pickled into a root-parallel worker
+        worker = copy.copy(self)
+        worker.network = None
+        worker.num_workers = 1
+        worker.pool = None
+        worker.shared_network = None
+        worker.weights_version = None
+        # The evaluator's thread stays in this process; workers call the network themselves
+        worker.evaluator = None
+        worker.root = None
+        worker.table = TranspositionTable(self.table.capacity) if self.table is not None else None
+        return worker
+
+    def weights_changed(self):
+        """
+        Call after training the network: drops the cached evaluations and
+        hands the new weights to the root-parallel workers, which reload
+        them and clear their own tables before their next search.
+        """
+        if self.table is not None:
+            self.table.clear()
+        if self.shared_network is not None:
+            with self.weights_version.get_lock():
+                if isinstance(self.shared_network, str):
+                    save_worker_network(self.network, self.shared_network)
+                else:
+                    self.shared_network.load_state_dict(self.network.state_dict())
+                self.weights_version.value += 1
+
+    def add_root_noise(self, rng: np.random.Generator):
+        children = list(self.root.children.values())
+        noise = rng.dirichlet([self.dirichlet_alpha] * len(children))
+        for child, eta in zip(children, noise):
+            child.prior = (1 - self.noise_fraction) * child.prior + self.noise_fraction * eta
+
+    def search_leaf_parallel(self, state, possible_actions, model=None):
+        """
+        Runs the simulations from `num_workers` threads sharing this tree.
+        Selection, expansion and backpropagation happen under a lock; the
+        network forward passes run outside of it, with virtual loss keeping
+        concurrent threads on different paths.
+        """
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(self.num_workers)
+        lock = threading.Lock()
+        remaining = [self.num_simulations]
+
+        def worker():
+            while True:
+                with lock:
+                    if remaining[0] == 0:
+                        return
+                    remaining[0] -= 1
+                    node, leaf_state, actions = self.descend(state, possible_actions, model)
+                    self.add_virtual_loss(node)
+                (policy, value), = self.evaluate_leaves([leaf_state])
+                with lock:
+                    self.revert_virtual_loss(node)
+                    self.complete(node, leaf_state, actions, policy, value)
+
+        futures = [self.pool.submit(worker) for _ in range(self.num_workers)]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+            if isinstance(self.shared_network, str):
+                os.remove(self.shared_network)
+            self.shared_network = None
+            self.weights_version = None
+
+    def new_root(self, state, possible_actions):
+        # The caller may reuse its input buffer, so the tree keeps its own copy
+        self.root = TreeNode(np.copy(state))
+        self.root.expand(possible_actions, self.root_priors(state, possible_actions))
+        if self.root_noise is not None:
+            self.add_root_noise(self.root_noise)
+
+    def root_state(self):
+        return self.root.state
+
+    def root_visits(self) -> Dict[str, int]:
+        return {action: child.visit_count for action, child in self.root.children.items()}
+
+    def reuse_root(self, possible_actions):
+        # Drop children that are no longer legal and add the newly legal ones
+        for action in list(self.root.children):
+            if action not in possible_actions:
+                del self.root.children[action]
+        self.root.expand([action for action in possible_actions if action not in self.root.children])
+
+    def advance(self, action, state):
+        """
+        Makes the child reached by `action` the root of the next search, so
+        its visit statistics carry over. The tree is discarded instead when
+        the child was never reached or its state does not match the observed
+        `state`.
+        """
+        child = self.root.children.get(action) if self.root is not None else None
+        if child is None or child.state is None or not np.array_equal(child.state, state):
+            self.root = None
+            return
+        child.parent = None
+        child.state = np.copy(state)
+        self.root = child
+
+    def reset(self):
+        self.root = None
+
+    def search_batched(self, state, possible_actions, model=None):
+        """
+        Runs the simulations in rounds of up to `eval_batch_size` leaves.
+
+        Every selected path carries a virtual loss until its leaf has been
+        evaluated, which steers the following selections of the same round
+        towards other leaves. A round stops early when a leaf is selected
+        twice, and all pending leaves are evaluated in one forward pass.
+        """
+        simulations = 0
+        while simulations < self.num_simulations:
+            batch_size = min(self.eval_batch_size, self.num_simulations - simulations)
+            leaves = []
+            pending = set()
+            for _ in range(batch_size):
+                node, leaf_state, actions = self.descend(state, possible_actions, model)
+                self.add_virtual_loss(node)
+                if node in pending:
+                    self.revert_virtual_loss(node)
+                    break
+                pending.add(node)
+                leaves.append((node, leaf_state, actions))
+
+            evaluations = self.evaluate_leaves([leaf_state for _, leaf_state, _ in leaves])
+            for (node, leaf_state, actions), (policy, value) in zip(leaves, evaluations):
+                self.revert_virtual_loss(node)
+                self.complete(node, leaf_state, actions, policy, value)
+            simulations += len(leaves)
+
+    def descend(self, state, possible_actions, model=None):
+        """
+        Selects a leaf and returns it with the encoded state to evaluate it on
+        (None once the model reports the episode as done) and its legal actions.
+        """
+        if model is None:
+            # Every leaf is evaluated on the root state, so that is the state its statistics belong to
+            node = self.select_leaf()
+            self.set_state(node, self.root_state())
+            return node, state, possible_actions
+
+        simulation = self.scratch
+        simulation.restore(self.scratch_snapshot)
+        simulation.rng = np.random.default_rng(self.seed_sequence.spawn(1)[0])
+        node = self.root
+        done = False
+        while not done and not self.is_leaf(node):
+            action, node = self.select_child(node)
+            _, reward, done = simulation.step(action)
+            self.set_reward(node, reward)
+        if done:
+            return node, None, []
+        leaf_state = self.encoder(simulation.get_state())
+        self.set_state(node, leaf_state)
+        return node, leaf_state, simulation.get_possible_actions()
+
+    def complete(self, node, leaf_state, actions, policy, value):
+        # Terminal leaves are worth nothing beyond the rewards already on the path
+        if leaf_state is None:
+            value = 0.0
+        elif self.is_leaf(node):
+            self.expand(node, actions, self.priors(policy, actions))
+        self.backpropagate(node, value)
+
+    def priors(self, policy: np.ndarray, actions: List[str]):
+        """
+        Renormalizes the network policy over the legal `actions`. Actions the
+        network has no output for get a uniform share.
+        """
+        if self.action_space is None:
+            return None
+        uniform = 1.0 / len(self.action_space)
+        priors = np.array([policy[self.action_index[action]] if action in self.action_index else uniform
+                           for action in actions], dtype=np.float32)
+        return priors / priors.sum()
+
+    def root_priors(self, state, possible_actions):
+        if self.action_space is None:
+            return None
+        policies, values = self.evaluate([state])
+        return self.priors(policies[0], possible_actions)
+
+    def evaluate_leaves(self, leaf_states) -> List[Tuple[np.ndarray, float]]:
+        # Evaluates the non-terminal leaves in one batch; terminal ones get (None, 0.0)
+        states = [leaf_state for leaf_state in leaf_states if leaf_state is not None]
+        results = iter(zip(*self.evaluate(states))) if states else iter(())
+        return [next(results) if leaf_state is not None else (None, 0.0) for leaf_state in leaf_states]
+
+    def select_leaf(self) -> TreeNode:
+        node = self.root
+        while not node.is_leaf():
+            # Select the best action
+            best_action, node = self.select_child(node)
+        return node
+
+    def select_child(self, node: TreeNode) -> Tuple[str, TreeNode]:
+        best_action, best_value = self.select(node)
+        return best_action, node.children[best_action]
+
+    def set_reward(self, node: TreeNode, reward: float):
+        node.reward = reward * self.reward_scale
+
+    def set_state(self, node: TreeNode, state):
+        if node.state is None:
+            node.state = state
+
+    def is_leaf(self, node: TreeNode) -> bool:
+        return node.is_leaf()
+
     def select(self, node: TreeNode) -> Tuple[str, float]:
         best_score = -float('inf')
         best_action = None
@@ -78,13 +400,107 @@ class MCTS:
                 best_action = action
         return best_action, best_score
 
+    def expand(self, node: TreeNode, actions: List[str], priors=None):
+        node.expand(actions, priors)
+
+    def evaluate(self, states: List[np.ndarray]) -> Tuple[np.ndarray, List[float]]:
+        if self.table is None:
+            return self.forward(states)
+
+        # Serve cached states from the table and run the network only on distinct misses
+        keys = [state_key(state) for state in states]
+        entries = {}
+        missing = {}
+        for key, state in zip(keys, states):
+            if key in entries or key in missing:
+                continue
+            entry = self.table.get(key)
+            if entry is None:
+                missing[key] = state
+            else:
+                entries[key] = entry
+        if missing:
+            policies, values = self.forward(list(missing.values()))
+            for key, policy, value in zip(missing, policies, values):
+                entries[key] = self.table.put(key, policy, value)
+        return np.stack([entries[key].policy for key in keys]), [entries[key].value for key in keys]
+
+    def forward(self, states: List[np.ndarray]) -> Tuple[np.ndarray, List[float]]:
+        # One forward pass for the whole batch of leaf states
+        if self.evaluator is not None:
+            return self.evaluator.evaluate(states)
+        policy, value = self.network.predict(batch_state_tensor(states))
+        return policy.numpy(), value.tolist()
+
+    def add_virtual_loss(self, node: TreeNode):
+        while node is not None:
+            node.visit_count += self.virtual_loss
+            node.value_sum -= self.virtual_loss
+            node = node.parent
+
+    def revert_virtual_loss(self, node: TreeNode):
+        while node is not None:
+            node.visit_count -= self.virtual_loss
+            node.value_sum += self.virtual_loss
+            node = node.parent
+
     def backpropagate(self, node: TreeNode, value: float):
         while node is not None:
+            # Each node accumulates the return from its incoming edge onwards
+            value = node.reward + self.discount * value
             node.visit_count += 1
             node.value_sum += value
             node = node.parent
 
+# The search of a root-parallel worker process, set up by init_root_worker
+WORKER_MCTS = None
+WORKER_NETWORK = None
+WORKER_VERSION = None
+WORKER_LOADED_VERSION = -1
+
+def init_root_worker(mcts: MCTS, network, version):
+    global WORKER_MCTS, WORKER_NETWORK, WORKER_VERSION
+    WORKER_MCTS = mcts
+    WORKER_NETWORK = network
+    WORKER_VERSION = version
+    mcts.network = load_worker_network(network)
+
+def save_worker_network(network, path: str):
+    if not isinstance(network, torch.jit.ScriptModule):
+        network = torch.jit.script(network)
+    torch.jit.save(network, path)
+
+def load_worker_network(network):
+    # A private copy of the parent's shared-memory network, or its TorchScript file loaded
+    if isinstance(network, str):
+        return torch.jit.load(network)
+    return copy.deepcopy(network)
+
+def root_search_worker(num_simulations, seed: np.random.SeedSequence, state, possible_actions, model=None) -> Dict[str, int]:
+    global WORKER_LOADED_VERSION
+    mcts = WORKER_MCTS
+    with WORKER_VERSION.get_lock():
+        if WORKER_VERSION.value != WORKER_LOADED_VERSION:
+            # Reload under the lock so a weights_changed() in the parent is never read half-written
+            if isinstance(WORKER_NETWORK, str):
+                mcts.network = torch.jit.load(WORKER_NETWORK)
+            else:
+                mcts.network.load_state_dict(WORKER_NETWORK.state_dict())
+            WORKER_LOADED_VERSION = WORKER_VERSION.value
+            if mcts.table is not None:
+                mcts.table.clear()
+    mcts.num_simulations = num_simulations
+    noise_seed, simulation_seed = seed.spawn(2)
+    mcts.root_noise = np.random.default_rng(noise_seed)
+    mcts.seed_sequence = simulation_seed
+    mcts.search(state, possible_actions, model)
+    return mcts.root_visits()
+
 def state_tensor(state: np.ndarray) -> torch.Tensor:
-    # Convert the state to a PyTorch tensor
-    tensor = torch.tensor(state, dtype=torch.float32).unsqueeze(0).unsqueeze(0)  # Shape: [1, 1, H, W]
-    return tensor
\ No newline at end of file
+    # Convert the (C, H, W) state to a PyTorch tensor, without a copy for float32 input
+    tensor = torch.as_tensor(state, dtype=torch.float32).unsqueeze(0)  # Shape: [1, C, H, W]
+    return tensor
+
+def batch_state_tensor(states: List[np.ndarray]) -> torch.Tensor:
+    # Stack several states along the batch dimension
+    return torch.as_tensor(np.stack(states), dtype=torch.float32)
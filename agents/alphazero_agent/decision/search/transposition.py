@@ -0,0 +1,82 @@
+# search/transposition.py
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+import numpy as np
+
+def state_key(state: np.ndarray) -> Hashable:
+    # Cheap hash of the encoded state; shape and dtype guard against accidental collisions
+    state = np.ascontiguousarray(state)
+    return (state.shape, state.dtype.str, hash(state.tobytes()))
+
+class TableEntry:
+    __slots__ = ("policy", "value")
+
+    def __init__(self, policy: np.ndarray, value: float):
+        self.policy = policy
+        self.value = value
+
+class TranspositionTable:
+    """
+    Bounded LRU cache of network evaluations, keyed by
+    `state_key` of the encoded state. Safe to share between search threads.
+    """
+    def __init__(self, capacity: int=100000):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Optional[TableEntry]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, policy: np.ndarray, value: float) -> TableEntry:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.policy = policy
+                entry.value = value
+                self.entries.move_to_end(key)
+                return entry
+            entry = TableEntry(policy, value)
+            self.entries[key] = entry
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            return entry
+
+    def clear(self):
+        # Cached evaluations are stale once the network weights change
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,37 @@
+# training/replay_buffer.py
+
+from typing import Tuple
+import numpy as np
+
+class ReplayBuffer:
+    """
+    Fixed-size store of self-play positions in preallocated arrays: the
+    encoded state, the MCTS visit distribution and the observed return.
+    Once full, the oldest positions are overwritten.
+    """
+    def __init__(self, capacity: int, state_shape: Tuple[int, ...], num_actions: int):
+        self.capacity = capacity
+        self.states = np.zeros((capacity,) + tuple(state_shape), dtype=np.float32)
+        self.policies = np.zeros((capacity, num_actions), dtype=np.float32)
+        self.values = np.zeros(capacity, dtype=np.float32)
+        self.position = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add_batch(self, states: np.ndarray, policies: np.ndarray, values: np.ndarray):
+        n = len(states)
+        if n > self.capacity:
+            states, policies, values = states[-self.capacity:], policies[-self.capacity:], values[-self.capacity:]
+            n = self.capacity
+        indices = (self.position + np.arange(n)) % self.capacity
+        self.states[indices] = states
+        self.policies[indices] = policies
+        self.values[indices] = values
+        self.position = (self.position + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def sample(self, batch_size: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        indices = rng.integers(self.size, size=batch_size)
+        return self.states[indices], self.policies[indices], self.values[indices]
@@ -0,0 +1,106 @@
+# training/self_play.py
+
+import copy
+import queue
+import time
+import traceback
+from typing import Dict, Iterator, Tuple
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+def self_play_worker(agent_config: Dict, num_simulations: int, network, version, trajectories, stop, seed):
+    """
+    Worker process: plays episodes with its own GridWorld and MCTS, reloading
+    the learner's shared weights whenever their version changes, and sends
+    each trajectory back as tensors so they travel through shared memory.
+    An error is sent back instead, for the learner to raise.
+    """
+    try:
+        # Imported here, the agent module imports this one
+        from ..alpha_zero import AlphaZeroAgent
+        torch.set_num_threads(1)
+        agent = AlphaZeroAgent(**dict(agent_config, num_workers=1, seed=seed))
+        agent.mcts.num_simulations = num_simulations
+        local_version = -1
+        while not stop.is_set():
+            with version.get_lock():
+                if version.value != local_version:
+                    agent.network.load_state_dict(network.state_dict())
+                    local_version = version.value
+                    agent.mcts.weights_changed()
+            states, policies, returns, total_reward = agent.self_play()
+            send(trajectories, (torch.from_numpy(states), torch.from_numpy(policies), torch.from_numpy(returns), total_reward), stop)
+    except Exception:
+        send(trajectories, RuntimeError(f"Self-play worker failed:\n{traceback.format_exc()}"), stop)
+        raise
+
+def send(trajectories, item, stop):
+    # Waits for room in the queue unless the pool is shutting down
+    while not stop.is_set():
+        try:
+            trajectories.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+class SelfPlayPool:
+    """
+    `num_workers` self-play processes feeding trajectories to the learner,
+    which is the process that owns the pool. Workers play against a shared
+    copy of the learner's network that `publish` refreshes. While waiting
+    for a trajectory the learner checks every `poll_interval` seconds that
+    the workers are still alive.
+    """
+    def __init__(self, agent, num_workers: int, queue_size: int=64, seed=None, poll_interval: float=1.0):
+        self.poll_interval = poll_interval
+        self.context = mp.get_context("spawn")
+        self.network = copy.deepcopy(agent.network).share_memory()
+        self.version = self.context.Value("i", 0)
+        self.trajectories = self.context.Queue(queue_size)
+        self.stop = self.context.Event()
+        seeds = np.random.SeedSequence(seed).generate_state(num_workers)
+        self.workers = [
+            self.context.Process(target=self_play_worker, daemon=True,
+                                 args=(agent.config, agent.mcts.num_simulations, self.network, self.version,
+                                       self.trajectories, self.stop, int(worker_seed)))
+            for worker_seed in seeds
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def publish(self, network):
+        # Workers pick the new weights up before their next episode
+        with self.version.get_lock():
+            self.network.load_state_dict(network.state_dict())
+            self.version.value += 1
+
+    def episodes(self, count: int) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, float]]:
+        for _ in range(count):
+            states, policies, returns, total_reward = self.next_trajectory()
+            # Copy out of shared memory before the worker's segment goes away
+            yield states.numpy().copy(), policies.numpy().copy(), returns.numpy().copy(), total_reward
+
+    def next_trajectory(self):
+        while True:
+            try:
+                item = self.trajectories.get(timeout=self.poll_interval)
+            except queue.Empty:
+                # Workers only exit when stopped, so a dead one has crashed
+                for worker in self.workers:
+                    if not worker.is_alive():
+                        raise RuntimeError(f"Self-play worker {worker.pid} exited with code {worker.exitcode}")
+                continue
+            if isinstance(item, Exception):
+                raise item
+            return item
+
+    def close(self):
+        self.stop.set()
+        deadline = time.monotonic() + 5
+        for worker in self.workers:
+            worker.join(max(0, deadline - time.monotonic()))
+            if worker.is_alive():
+                worker.terminate()
+        self.trajectories.close()
+        self.trajectories.cancel_join_thread()
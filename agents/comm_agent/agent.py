@@ -1,18 +1,55 @@
 # agents/agent_a.py
 
+from typing import Optional
+
 import requests
+from pydantic import PrivateAttr
 from swarm import Agent
+from .cache import ResponseCache, cache_key
+from .client import ASYNC_ERRORS, AsyncOllamaClient, OllamaClient
 
 class CommunicatingAgent(Agent):
-    def __init__(self, ollama_api_key, ollama_endpoint, instructions: str = "You are a helpful agent interfacing with Ollama."):
+    # Agent is a pydantic model: the connection settings are fields, the clients and cache private attributes
+    ollama_api_key: Optional[str] = None
+    ollama_endpoint: str = ""
+    _client: OllamaClient = PrivateAttr()
+    _async_client: Optional[AsyncOllamaClient] = PrivateAttr(default=None)
+    _async_settings: dict = PrivateAttr(default_factory=dict)
+    _cache: ResponseCache = PrivateAttr()
+
+    def __init__(self, ollama_api_key, ollama_endpoint, instructions: str = "You are a helpful agent interfacing with Ollama.",
+                 timeout=(3.05, 60), max_retries: int = 3, backoff_factor: float = 0.5, cache: ResponseCache = None):
         super().__init__(
             name="Language Model",
             instructions=instructions,
             functions=[self.handle_ollama_request],
+            ollama_api_key=ollama_api_key,
+            ollama_endpoint=ollama_endpoint,
         )
-        self.ollama_api_key = ollama_api_key
-        self.ollama_endpoint = ollama_endpoint
-        
+        self._client = OllamaClient(ollama_endpoint, ollama_api_key, timeout=timeout,
+                                    max_retries=max_retries, backoff_factor=backoff_factor)
+        # Created on the first asynchronous request
+        self._async_client = None
+        self._async_settings = {
+            "timeout": sum(timeout) if isinstance(timeout, tuple) else timeout,
+            "max_retries": max_retries,
+            "backoff_factor": backoff_factor,
+        }
+        # Repeated prompts are answered from the cache; pass ResponseCache(max_entries=0) to disable it
+        self._cache = cache if cache is not None else ResponseCache()
+
+    @property
+    def client(self) -> OllamaClient:
+        return self._client
+
+    @property
+    def cache(self) -> ResponseCache:
+        return self._cache
+
+    @property
+    def async_client(self) -> Optional[AsyncOllamaClient]:
+        # None until the first asynchronous request
+        return self._async_client
 
     def handle_ollama_request(self, prompt):
         """
@@ -24,20 +61,39 @@ class CommunicatingAgent(Agent):
         Returns:
             str: The response from Ollama.
         """
-        headers = {
-            "Authorization": f"Bearer {self.ollama_api_key}",
-            "Content-Type": "application/json",
-        }
-        payload = {
+        try:
+            payload = self.build_payload(prompt)
+            key = cache_key(self.ollama_endpoint, payload)
+            data = self.cache.get_or_compute(key, lambda: self.client.generate(payload))
+            return data.get("response", "No response received from Ollama.")
+        except requests.exceptions.RequestException as e:
+            return f"An error occurred while communicating with Ollama: {e}"
+
+    async def handle_ollama_request_async(self, prompt):
+        """
+        Asynchronous version of handle_ollama_request, so many prompts can be
+        in flight at once.
+
+        Args:
+            prompt (str): The input prompt to send to Ollama.
+
+        Returns:
+            str: The response from Ollama.
+        """
+        if self._async_client is None:
+            self._async_client = AsyncOllamaClient(self.ollama_endpoint, self.ollama_api_key, **self._async_settings)
+        try:
+            payload = self.build_payload(prompt)
+            key = cache_key(self.ollama_endpoint, payload)
+            data = await self.cache.get_or_compute_async(key, lambda: self._async_client.generate(payload))
+            return data.get("response", "No response received from Ollama.")
+        except ASYNC_ERRORS as e:
+            # Timeouts carry no message, so fall back to the exception's name
+            return f"An error occurred while communicating with Ollama: {str(e) or type(e).__name__}"
+
+    def build_payload(self, prompt):
+        return {
             "prompt": prompt,
             "max_tokens": 150,
             "temperature": 0.7,
         }
-
-        try:
-            response = requests.post(self.ollama_endpoint, json=payload, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            return data.get("response", "No response received from Ollama.")
-        except requests.exceptions.RequestException as e:
-            return f"An error occurred while communicating with Ollama: {e}"
\ No newline at end of file
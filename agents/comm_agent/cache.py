@@ -0,0 +1,163 @@
+# agents/comm_agent/cache.py
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+def cache_key(endpoint: str, payload: Dict[str, Any]) -> str:
+    """
+    Key for a request: the endpoint plus the whole payload, i.e. prompt,
+    model and sampling parameters.
+    """
+    data = json.dumps({"endpoint": endpoint, "payload": payload}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    LRU cache of LLM responses with a time-to-live, optionally backed by an
+    SQLite file so entries survive restarts. Concurrent requests for the
+    same key are coalesced: only the first one calls the LLM and the others
+    wait for its result.
+
+    Args:
+        max_entries (int): Entries kept in memory; 0 disables the cache.
+        ttl (float): Seconds an entry stays valid.
+        path (str): SQLite file for the on-disk store, or None for memory only.
+    """
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires, value)
+        self.lock = threading.Lock()
+        self.in_flight: Dict[str, Future] = {}
+        # Keyed by (event loop, key), as a task can only be awaited from its own loop
+        self.async_in_flight: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+            self.db.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+            self.db.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            return self.lookup(key)
+
+    def lookup(self, key: str) -> Optional[Any]:
+        # Callers hold the lock
+        entry = self.entries.get(key)
+        if entry is None and self.db is not None:
+            row = self.db.execute("SELECT expires, value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                entry = (row[0], json.loads(row[1]))
+                self.store(key, entry)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                self.discard(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        entry = (time.time() + self.ttl, value)
+        with self.lock:
+            self.store(key, entry)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, json.dumps(value), entry[0]))
+                self.db.commit()
+
+    def store(self, key: str, entry):
+        # Callers hold the lock
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def discard(self, key: str):
+        # Callers hold the lock
+        self.entries.pop(key, None)
+        if self.db is not None:
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.db.commit()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for `key`, or calls `compute` and caches its
+        result. Threads asking for a key already being computed wait for that
+        call instead of making their own. Exceptions are passed to every
+        waiter and nothing is cached.
+        """
+        with self.lock:
+            # Looked up under the same lock as in_flight, so a value cannot land in between
+            value = self.lookup(key)
+            if value is not None:
+                return value
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+    async def get_or_compute_async(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Asynchronous version of get_or_compute, coalescing coroutines of one
+        event loop. `compute` runs in a task of its own that every caller
+        awaits through a shield, so a cancelled caller, the first one
+        included, does not cancel the request the others are waiting for.
+        """
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            value = self.lookup(key)
+            if value is not None:
+                return value
+            task = self.async_in_flight.get((loop, key))
+            if task is None:
+                task = self.async_in_flight[(loop, key)] = loop.create_task(self.compute_async(loop, key, compute))
+                # Mark the exception as retrieved in case every caller was cancelled
+                task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return await asyncio.shield(task)
+
+    async def compute_async(self, loop: asyncio.AbstractEventLoop, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await compute()
+            self.put(key, value)
+            return value
+        finally:
+            with self.lock:
+                del self.async_in_flight[(loop, key)]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,132 @@
+# agents/comm_agent/client.py
+
+import asyncio
+import random
+from typing import Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import aiohttp
+except ImportError:  # Only needed by AsyncOllamaClient
+    aiohttp = None
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# What AsyncOllamaClient.generate raises once its retries are used up
+ASYNC_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError) if aiohttp else (asyncio.TimeoutError,)
+
+class OllamaClient:
+    """
+    Blocking Ollama client on a pooled requests.Session, so connections are
+    kept alive between prompts.
+
+    Args:
+        endpoint (str): URL prompts are POSTed to.
+        api_key (str): Sent as a bearer token.
+        timeout (float or tuple): Seconds, or (connect, read) seconds, per attempt.
+        max_retries (int): Retries on connection errors, timeouts and 429/5xx responses.
+        backoff_factor (float): Retries wait backoff_factor * 2 ** (retry - 1) seconds.
+        pool_size (int): Connections kept open to the endpoint.
+    """
+    def __init__(self, endpoint: str, api_key: str = None, timeout: Union[float, Tuple[float, float]] = (3.05, 60),
+                 max_retries: int = 3, backoff_factor: float = 0.5, pool_size: int = 10):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        retry = Retry(total=max_retries, backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=frozenset({"POST"}), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(request_headers(api_key))
+
+    def generate(self, payload: Dict) -> Dict:
+        """
+        Sends one request and returns the decoded JSON response.
+
+        Raises:
+            requests.exceptions.RequestException: Once the retries are used up.
+        """
+        response = self.session.post(self.endpoint, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+class AsyncOllamaClient:
+    """
+    asyncio Ollama client on one aiohttp session, for keeping many requests
+    in flight from a single process. Takes the same arguments as
+    OllamaClient, with `timeout` as total seconds per attempt and
+    `pool_size` bounding the concurrent connections.
+    """
+    def __init__(self, endpoint: str, api_key: str = None, timeout: float = 60, max_retries: int = 3,
+                 backoff_factor: float = 0.5, pool_size: int = 100):
+        if aiohttp is None:
+            raise ImportError("AsyncOllamaClient requires aiohttp")
+        self.endpoint = endpoint
+        self.headers = request_headers(api_key)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.pool_size = pool_size
+        self.session: Optional["aiohttp.ClientSession"] = None
+        self.session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get_session(self) -> "aiohttp.ClientSession":
+        # aiohttp sessions belong to the event loop that created them, so each
+        # new loop (e.g. a later asyncio.run) gets a session of its own
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.session.closed or self.session_loop is not loop:
+            # A session left behind by a finished loop cannot be closed from this one
+            self.session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+            )
+            self.session_loop = loop
+        return self.session
+
+    async def generate(self, payload: Dict) -> Dict:
+        """
+        Sends one request and returns the decoded JSON response.
+
+        Raises:
+            aiohttp.ClientError or asyncio.TimeoutError: Once the retries are used up.
+        """
+        session = self.get_session()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with session.post(self.endpoint, json=payload) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                        await response.release()
+                    else:
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+            # Exponential backoff with jitter so stalled NPCs do not retry in lockstep
+            await asyncio.sleep(self.backoff_factor * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+            self.session_loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+def request_headers(api_key: Optional[str]) -> Dict[str, str]:
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    return headers
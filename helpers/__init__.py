@@ -1,4 +1,3 @@
 # helpers/__init__.py
 
-from .database_handler import DatabaseHandler
-from .transfer_function import transfer_to_agent_b
\ No newline at end of file
+from .transfer_function import DialogueStream, StreamStats, transfer_to_agent
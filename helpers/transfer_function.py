@@ -1,20 +1,159 @@
 # helpers/transfer_function.py
 
+import asyncio
+import re
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
 import ollama
-from agents.decision_making_agent.agent import AgentB
-
-def transfer_to_agent_b():
-    stream = ollama.chat(
-        model='llama3.1',
-        messages=[{'role': 'user', 'content': 'Why is the sky blue?'}],
-        stream=True,
-    )
-    agent_b = AgentB()
-    # Assuming you want to process the stream and interact with AgentB
-    for message in stream:
-        content = message.get("content", "")
-        if content:
-            # Here you can define how to send the content to AgentB
-            response = agent_b.process_message(content)
+
+# A sentence ends at ., ! or ? (optionally followed by closing quotes/brackets) and whitespace
+SENTENCE_END = re.compile(r"""[.!?]+["')\]]*\s+""")
+
+def split_sentences(text: str):
+    """
+    Splits complete sentences off the front of `text`.
+
+    Returns:
+        tuple: (list of complete sentences, the unfinished remainder).
+    """
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        sentences.append(text[start:match.end()].strip())
+        start = match.end()
+    return sentences, text[start:]
+
+class StreamStats:
+    """
+    Timing of one streamed completion: time to first token and token rate.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.end = None
+        self.tokens = 0
+
+    def record_token(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.tokens += 1
+
+    @property
+    def ttft(self) -> Optional[float]:
+        # Seconds from the request to the first token
+        return None if self.first_token is None else self.first_token - self.start
+
+    @property
+    def tokens_per_sec(self) -> float:
+        if self.first_token is None:
+            return 0.0
+        elapsed = (self.end or time.perf_counter()) - self.first_token
+        return self.tokens / elapsed if elapsed > 0 else 0.0
+
+class DialogueStream:
+    """
+    Streams an Ollama chat completion as sentences.
+
+    Tokens are read by one task into a bounded token queue and merged into
+    sentences by another task feeding a bounded sentence queue, so
+    generation keeps going while the consumer handles earlier sentences and
+    only pauses when both queues are full. Iterate with `async for`;
+    `cancel()` stops generation, e.g. when the player walks away.
+
+    Args:
+        model (str): Ollama model name.
+        messages (list): Chat messages.
+        max_tokens_queued (int): Capacity of the token queue.
+        max_sentences_queued (int): Capacity of the sentence queue.
+        client (ollama.AsyncClient): Client to use; a default one is created otherwise.
+    """
+    def __init__(self, model: str, messages: List[Dict], max_tokens_queued: int = 64,
+                 max_sentences_queued: int = 4, client: ollama.AsyncClient = None):
+        self.model = model
+        self.messages = messages
+        self.client = client or ollama.AsyncClient()
+        self.tokens = asyncio.Queue(max_tokens_queued)
+        self.sentences = asyncio.Queue(max_sentences_queued)
+        self.stats = StreamStats()
+        self.tasks = []
+        # Marks the end of a queue
+        self.done = object()
+
+    def start(self):
+        if not self.tasks:
+            self.stats = StreamStats()
+            self.tasks = [asyncio.create_task(self.produce()), asyncio.create_task(self.chunk())]
+
+    async def produce(self):
+        try:
+            stream = await self.client.chat(model=self.model, messages=self.messages, stream=True)
+            try:
+                async for part in stream:
+                    content = part["message"]["content"]
+                    if content:
+                        self.stats.record_token()
+                        await self.tokens.put(content)
+            finally:
+                # Closes the HTTP stream if this task is cancelled
+                await stream.aclose()
+        except Exception:
+            # Let the consumer finish; it re-raises the error from this task
+            await self.tokens.put(self.done)
+            raise
+        finally:
+            self.stats.end = time.perf_counter()
+        await self.tokens.put(self.done)
+
+    async def chunk(self):
+        buffer = ""
+        while True:
+            token = await self.tokens.get()
+            if token is self.done:
+                break
+            buffer += token
+            sentences, buffer = split_sentences(buffer)
+            for sentence in sentences:
+                await self.sentences.put(sentence)
+        if buffer.strip():
+            await self.sentences.put(buffer.strip())
+        await self.sentences.put(self.done)
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        self.start()
+        return self
+
+    async def __anext__(self) -> str:
+        sentence = await self.sentences.get()
+        if sentence is self.done:
+            # Surface errors from the producer, e.g. a failed request
+            await asyncio.gather(*self.tasks)
+            raise StopAsyncIteration
+        return sentence
+
+    async def cancel(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.stats.end is None:
+            self.stats.end = time.perf_counter()
+
+async def transfer_to_agent(handle_message: Callable[[str], object], prompt: str = "Why is the sky blue?",
+                            model: str = "llama3.1", stream: DialogueStream = None) -> StreamStats:
+    """
+    Streams a completion to an agent sentence by sentence. `handle_message`
+    is called for every sentence in a worker thread, so a slow agent does
+    not hold up generation beyond the queues' capacity.
+
+    Returns:
+        StreamStats: TTFT and tokens/sec of the completion.
+    """
+    stream = stream or DialogueStream(model, [{"role": "user", "content": prompt}])
+    loop = asyncio.get_running_loop()
+    try:
+        async for sentence in stream:
+            response = await loop.run_in_executor(None, handle_message, sentence)
             print(response)
-    return agent_b
\ No newline at end of file
+    finally:
+        await stream.cancel()
+    return stream.stats
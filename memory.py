@@ -1,33 +1,305 @@
+import logging
+import re
+import threading
+import time
+import weakref
+import numpy as np
+import pyarrow as pa
 import lancedb
 from character import Character, create_character
 
+logger = logging.getLogger(__name__)
+
+# One LanceDB connection per uri, shared by every Memory
+CONNECTIONS = {}
+CONNECTIONS_LOCK = threading.Lock()
+
+def get_connection(uri):
+    with CONNECTIONS_LOCK:
+        db = CONNECTIONS.get(uri)
+        if db is None:
+            db = CONNECTIONS[uri] = lancedb.connect(uri)
+        return db
+
+def column_to_numpy(column):
+    # Vectors (fixed-size lists) become a 2-D array, other columns 1-D
+    column = column.combine_chunks()
+    if pa.types.is_fixed_size_list(column.type):
+        return column.flatten().to_numpy(zero_copy_only=False).reshape(len(column), column.type.list_size)
+    return column.to_numpy(zero_copy_only=False)
+
+def memory_schema(vector_dim, vector_column="vector"):
+    # A memory is an embedding and the text it was made from
+    return pa.schema([
+        pa.field(vector_column, pa.list_(pa.float32(), vector_dim)),
+        pa.field("text", pa.string()),
+    ])
+
+def table_name_for(name):
+    # LanceDB table names may only hold alphanumerics, underscores, hyphens and periods
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+def flush_left_over(uri, table_name, schema, pending, flush_lock, write_lock):
+    # Writes what a Memory still buffered when it was collected or the interpreter exits
+    with flush_lock:
+        with write_lock:
+            batch = list(pending)
+            pending.clear()
+        if not batch:
+            return
+        try:
+            get_connection(uri).create_table(table_name, schema=schema, exist_ok=True).add(batch)
+        except Exception:
+            logger.exception("Lost %d buffered memories for table %s", len(batch), table_name)
+
+class MemoryMaintenance:
+    """
+    One background thread serving every Memory: it flushes buffered writes
+    that have waited past their age limit and compacts tables that have
+    taken new writes since their last compaction.
+    """
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.memories = weakref.WeakSet()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def register(self, memory):
+        with self.lock:
+            self.memories.add(memory)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                memories = list(self.memories)
+            for memory in memories:
+                try:
+                    memory.maintain()
+                except Exception:
+                    logger.exception("Memory maintenance failed for %s", memory.character_name)
+
+MAINTENANCE = MemoryMaintenance()
+
 class Memory:
-    def __init__(self, uri="data/sample-lancedb", character_name: str = "John Doe", character: Character = create_character()):
+    """
+    A character's memories, in a table named after the character plus
+    "_memories" with an explicit schema: `vector_column` holding
+    `vector_dim` float32s and a "text" column, or the given `schema`. The
+    character's profile is kept in a separate table named after the
+    character. Nothing is opened on construction: the connection, shared
+    per uri, and the tables are opened on first use, and a table is only
+    created if it does not exist yet.
+
+    Memories are written behind: add_memory buffers them and they are
+    added in one batch once `batch_size` are pending or the oldest has
+    waited `max_delay` seconds, or on flush(); whatever is still buffered
+    is written when the Memory is garbage collected or the interpreter
+    exits. A batch whose write fails is retried with the next flush, up to
+    `max_flush_retries` times, and then dropped. Every `compact_every`
+    seconds a table that took writes is compacted, merging the small
+    fragments batches leave behind; 0 disables compaction.
+
+    Searches scan every row until the table holds `index_threshold` rows;
+    the background maintenance then builds an ANN index of `index_type`
+    (e.g. "IVF_PQ" or "IVF_HNSW_SQ") on `vector_column`, which compaction
+    keeps up to date. Indexed searches probe `nprobes` partitions and, with
+    `refine_factor`, re-rank refine_factor * limit candidates exactly.
+    """
+    def __init__(self, uri="data/sample-lancedb", character_name: str = "John Doe", character: Character = None,
+                 batch_size: int = 64, max_delay: float = 5.0, compact_every: float = 300.0,
+                 index_threshold: int = 10000, index_type: str = "IVF_PQ", metric: str = "l2",
+                 nprobes: int = 20, refine_factor: int = None, vector_column: str = "vector",
+                 vector_dim: int = 384, schema: pa.Schema = None, max_flush_retries: int = 3):
         self.uri = uri
-        self.db = self.connect_db()
         self.character_name = character_name
-        self.character = character
-        self.create_bot_character(
-            character_name=self.character.name,
-            character_definition=self.character
-        )
+        self.character = character if character is not None else create_character()
+        self._db = None
+        self._table = None
+        self._profile_table = None
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.compact_every = compact_every
+        # Always the same list, which the finalizer below holds on to
+        self.pending = []
+        self.pending_since = None
+        # write_lock guards the buffer and counters and is never held during I/O;
+        # flush_lock keeps the batches' writes in order
+        self.write_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.max_flush_retries = max_flush_retries
+        self.flush_failures = 0
+        self.last_compaction = time.monotonic()
+        self.writes_since_compaction = 0
+        self.index_threshold = index_threshold
+        self.index_type = index_type
+        self.metric = metric
+        self.nprobes = nprobes
+        self.refine_factor = refine_factor
+        self.vector_column = vector_column
+        self.schema = schema if schema is not None else memory_schema(vector_dim, vector_column)
+        self.table_name = table_name_for(f"{self.character.name}_memories")
+        weakref.finalize(self, flush_left_over, uri, self.table_name, self.schema, self.pending,
+                         self.flush_lock, self.write_lock)
+        self.indexed = None  # Looked up when first needed
+        self.rows_added = False
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = self.connect_db()
+        return self._db
+
+    @property
+    def table(self):
+        # The memory table; the profile is stored alongside when it is first opened
+        if self._table is None:
+            self.profile_table
+            self._table = self.create_table(self.table_name, schema=self.schema)
+        return self._table
+
+    @property
+    def profile_table(self):
+        if self._profile_table is None:
+            self._profile_table = self.create_bot_character(
+                character_name=self.character.name,
+                character_definition=self.character
+            )
+        return self._profile_table
 
     def connect_db(self):
-        return lancedb.connect(self.uri)
+        return get_connection(self.uri)
+
+    def create_table(self, table_name, data=None, schema=None):
+        # Opens the table when it already exists, leaving its data untouched
+        return self.db.create_table(table_name_for(table_name), data=data, schema=schema, exist_ok=True)
 
-    def create_table(self, table_name, data):
-        self.table = self.db.create_table(table_name, data=data)
-    
     def create_bot_character(self, character_name, character_definition):
+        if isinstance(character_definition, Character):
+            character_definition = [character_definition.to_dict()]
         return self.create_table(
             table_name=f"{character_name}",
             data=character_definition,
         )
-    
+
     def search_memory(self, query, limit=2):
-        return self.table.search(query).limit(limit).to_pandas()
-    
+        # Buffered memories become searchable here at the latest
+        self.flush()
+        return self.search_options(self.table.search(query)).limit(limit).to_pandas()
+
+    def search_memories(self, queries, limit=2, columns=None, as_numpy=False):
+        """
+        Runs several vector queries in one search. The result has a
+        `query_index` column giving the position of each row's query in
+        `queries`. Returned as a pyarrow Table, or with `as_numpy` as a dict
+        of NumPy arrays, one per column (vectors as a 2-D array), without
+        going through pandas.
+        """
+        self.flush()
+        vectors = np.asarray(queries, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None]
+        query = self.search_options(self.table.search(list(vectors), vector_column_name=self.vector_column))
+        if columns is not None:
+            query = query.select(list(columns))
+        result = query.limit(limit).to_arrow()
+        if len(vectors) == 1 and "query_index" not in result.column_names:
+            result = result.append_column("query_index", pa.array(np.zeros(len(result), dtype=np.int32)))
+        if not as_numpy:
+            return result
+        return {name: column_to_numpy(result.column(name)) for name in result.column_names}
+
+    def search_options(self, query):
+        if self.is_indexed():
+            query = query.nprobes(self.nprobes)
+            if self.refine_factor:
+                query = query.refine_factor(self.refine_factor)
+        return query
+
+    def is_indexed(self):
+        if self.indexed is None:
+            self.indexed = any(self.vector_column in index.columns for index in self.table.list_indices())
+        return self.indexed
+
+    def ensure_index(self):
+        # Builds the ANN index once the table has grown past index_threshold rows
+        if self.is_indexed() or self.table.count_rows() < self.index_threshold:
+            return False
+        # Built without holding write_lock; LanceDB takes appends meanwhile and the index covers them after compaction
+        self.table.create_index(metric=self.metric, vector_column_name=self.vector_column, index_type=self.index_type)
+        self.indexed = True
+        return True
+
     def add_memory(self, memory):
-        return self.table.add(memory)
-    
-    
\ No newline at end of file
+        # A single record (dict) or a list of records
+        records = memory if isinstance(memory, list) else [memory]
+        with self.write_lock:
+            if not self.pending:
+                self.pending_since = time.monotonic()
+            self.pending.extend(records)
+            full = len(self.pending) >= self.batch_size
+        MAINTENANCE.register(self)
+        if full:
+            # The records stay buffered on failure, so callers must not see an error and add them again;
+            # flush() keeps or drops them and the maintenance thread retries
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Writing memories for %s failed", self.character_name)
+
+    def flush(self):
+        with self.flush_lock:
+            with self.write_lock:
+                if not self.pending:
+                    return
+                batch = list(self.pending)
+                self.pending.clear()
+                self.pending_since = None
+            try:
+                self.table.add(batch)
+            except Exception:
+                with self.write_lock:
+                    self.flush_failures += 1
+                    if self.flush_failures > self.max_flush_retries:
+                        logger.error("Dropping %d memories for %s after %d failed writes",
+                                     len(batch), self.character_name, self.flush_failures)
+                        self.flush_failures = 0
+                    else:
+                        # Keep the batch for the next attempt
+                        self.pending[:0] = batch
+                        self.pending_since = time.monotonic()
+                raise
+            with self.write_lock:
+                self.flush_failures = 0
+                self.writes_since_compaction += 1
+                self.rows_added = True
+
+    def compact(self):
+        # LanceDB compacts concurrently with appends, so writers are not held up meanwhile
+        with self.write_lock:
+            writes, self.writes_since_compaction = self.writes_since_compaction, 0
+        try:
+            self.table.optimize()
+        except Exception:
+            with self.write_lock:
+                self.writes_since_compaction += writes
+            raise
+        self.last_compaction = time.monotonic()
+
+    def maintain(self):
+        # Called periodically by the MemoryMaintenance thread
+        now = time.monotonic()
+        pending_since = self.pending_since
+        if pending_since is not None and now - pending_since >= self.max_delay:
+            self.flush()
+        if self.compact_every and self.writes_since_compaction and now - self.last_compaction >= self.compact_every:
+            self.compact()
+        if self.index_threshold and self.rows_added and not self.indexed:
+            self.rows_added = False
+            self.ensure_index()
+
+    def close(self):
+        self.flush()
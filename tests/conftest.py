@@ -0,0 +1,10 @@
+# tests/conftest.py
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The top-level modules and packages, plus the decision package imported as `decision` like the search code does
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "agents", "alphazero_agent"))
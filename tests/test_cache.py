@@ -0,0 +1,48 @@
+# tests/test_cache.py
+
+import asyncio
+
+import pytest
+
+# agents/__init__.py imports both agents, which build on swarm
+pytest.importorskip("swarm")
+
+from agents.comm_agent.cache import ResponseCache
+
+def test_cancelled_owner_does_not_cancel_coalesced_waiters():
+    cache = ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"response": "ok"}
+
+    async def main():
+        owner = asyncio.ensure_future(cache.get_or_compute_async("key", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(cache.get_or_compute_async("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        owner.cancel()
+        results = await asyncio.gather(*waiters)
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return results
+
+    assert asyncio.run(main()) == [{"response": "ok"}] * 3
+    assert len(calls) == 1
+    assert cache.get("key") == {"response": "ok"}
+
+def test_failed_compute_reaches_every_waiter_and_is_not_cached():
+    cache = ResponseCache()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise asyncio.TimeoutError()
+
+    async def main():
+        return await asyncio.gather(*[cache.get_or_compute_async("key", compute) for _ in range(3)],
+                                    return_exceptions=True)
+
+    assert all(isinstance(result, asyncio.TimeoutError) for result in asyncio.run(main()))
+    assert cache.get("key") is None and not cache.async_in_flight
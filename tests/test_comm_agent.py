@@ -0,0 +1,63 @@
+# tests/test_comm_agent.py
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("aiohttp")
+# agents/__init__.py imports both agents, which build on swarm
+pytest.importorskip("swarm")
+
+from agents.comm_agent.agent import CommunicatingAgent
+from agents.comm_agent.client import AsyncOllamaClient
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        out = json.dumps({"response": "echo " + body["prompt"]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def endpoint():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/api/generate"
+    server.shutdown()
+
+def test_async_client_survives_a_new_event_loop(endpoint):
+    client = AsyncOllamaClient(endpoint)
+
+    async def ask(prompt, close=False):
+        try:
+            return (await client.generate({"prompt": prompt}))["response"]
+        finally:
+            if close:
+                await client.close()
+
+    assert asyncio.run(ask("a")) == "echo a"
+    # The first loop is closed now; its session must not be reused
+    assert asyncio.run(ask("b", close=True)) == "echo b"
+
+def test_communicating_agent_constructs(endpoint):
+    agent = CommunicatingAgent("key", endpoint)
+    assert agent.ollama_endpoint == endpoint
+    assert agent.handle_ollama_request("hi") == "echo hi"
+
+    async def ask():
+        try:
+            return await agent.handle_ollama_request_async("there")
+        finally:
+            await agent.async_client.close()
+
+    assert asyncio.run(ask()) == "echo there"
@@ -0,0 +1,22 @@
+# tests/test_decision_maker.py
+
+import pytest
+
+pytest.importorskip("swarm")
+
+from agents.alphazero_agent.agent import DecisionMaker, shared_network
+
+def test_training_replaces_the_shared_network(tmp_path):
+    model_path = str(tmp_path / "shared.pth")
+    trainer = DecisionMaker("trainer", model_path=model_path)
+    player = DecisionMaker("player", model_path=model_path)
+    old_network = player.get_agent().network
+    player.get_agent().mcts.table.put("stale", None, 0.0)
+
+    trainer.train(episodes=1)
+
+    network, version = shared_network(model_path, (5, 5), 4)
+    assert version == 1 and network is not old_network
+    agent = player.get_agent()
+    assert agent.network is network and agent.mcts.network is network
+    assert len(agent.mcts.table) == 0
@@ -0,0 +1,42 @@
+# tests/test_gridworld.py
+
+import pytest
+
+from decision.environment.gridworld import EntityTable, GridWorld
+
+def test_entity_table_reuses_freed_slots():
+    table = EntityTable((5, 5), capacity=2)
+    assert table.add("a", (0, 0)) == 0
+    assert table.add("b", (1, 1)) == 1
+    assert table.add("c", (2, 2)) == 2  # Grows
+    table.remove("a")
+    assert table.add("d", (3, 3)) == 0
+    assert table.add("e", (4, 4)) == 3
+    assert sorted(table.slots.values()) == [0, 1, 2, 3]
+
+def test_get_state_lists_npcs_and_items():
+    env = GridWorld(size=(5, 5), goal=(4, 4), seed=0)
+    state = env.get_state()
+    assert state["npcs"] == env.get_npcs()
+    assert set(state["items"]) == {f"Item-{i}" for i in range(5)}
+    assert set(state["items"]["Item-0"]) == {"position", "type", "value"}
+
+def test_get_state_events_are_dicts_and_arrays_stay_unshared():
+    env = GridWorld(size=(5, 5), goal=(4, 4), seed=0)
+    env.step("interact")
+    state = env.get_state()
+    assert state["events"]
+    assert all(set(event) == {"type", "content"} for event in state["events"])
+    # The arrays are read-only views, so the state cannot write into the world
+    for key in ("terrain", "npc_grid", "item_grid"):
+        assert not state[key].flags.writeable
+    with pytest.raises(ValueError):
+        state["terrain"][0, 0] = 0
+    assert env.terrain.flags.writeable
+    # Only snapshots share the arrays, so stepping does not copy them
+    assert not env.shared
+    snapshot = env.snapshot()
+    terrain = snapshot.terrain.copy()
+    for _ in range(20):
+        env.step("interact")
+    assert (snapshot.terrain == terrain).all()
@@ -0,0 +1,98 @@
+# tests/test_mcts.py
+
+import numpy as np
+import pytest
+
+from decision.alpha_zero import AlphaZeroAgent
+from decision.environment.gridworld import GridWorld
+
+@pytest.mark.parametrize("array_tree", [False, True])
+def test_advance_drops_tree_when_state_changes(array_tree):
+    agent = AlphaZeroAgent(seed=0, reuse_tree=True, array_tree=array_tree)
+    agent.mcts.num_simulations = 10
+    env = GridWorld(size=(5, 5), goal=(4, 4), seed=1)
+    state = env.get_state()
+    action = agent.select_action(state, env.get_possible_actions())
+    state, _, _ = env.step(action)
+    # Without a model the subtree was searched on the old state and cannot be kept
+    agent.observe(action, state)
+    assert agent.mcts.root is None
+
+def test_search_leaves_batchnorm_statistics_alone():
+    agent = AlphaZeroAgent(seed=0)
+    agent.mcts.num_simulations = 10
+    running_mean = agent.network.bn1.running_mean.clone()
+    env = GridWorld(size=(5, 5), goal=(4, 4), seed=1)
+    agent.select_action(env.get_state(), env.get_possible_actions())
+    assert not agent.network.training
+    assert (agent.network.bn1.running_mean == running_mean).all()
+
+def test_root_parallel_workers_persist_between_searches():
+    agent = AlphaZeroAgent(seed=0, num_workers=2, parallel="root")
+    agent.mcts.num_simulations = 20
+    env = GridWorld(size=(5, 5), goal=(4, 4), seed=1)
+    try:
+        for _ in range(2):
+            agent.select_action(env.get_state(), env.get_possible_actions())
+            assert sum(agent.mcts.visits.values()) == 20
+        pool = agent.mcts.pool
+        agent.mcts.weights_changed()
+        agent.select_action(env.get_state(), env.get_possible_actions())
+        assert agent.mcts.pool is pool
+        assert agent.mcts.weights_version.value == 1
+    finally:
+        agent.mcts.close()
+
+def test_simulations_draw_their_own_randomness():
+    from decision.environment.encoding import StateEncoder
+    from decision.models.network import AlphaZeroNetwork
+    from decision.search.mcts import MCTS
+
+    env = GridWorld(size=(5, 5), goal=(4, 4), seed=0)
+    encoder = StateEncoder((5, 5))
+    network = AlphaZeroNetwork(input_shape=(5, 5), num_actions=4, in_channels=encoder.num_channels)
+    mcts = MCTS(network, action_space=["up", "down", "left", "right"], encoder=encoder.encode, seed=0)
+    mcts.new_root(encoder.encode(env.get_state()), ["right"])
+    mcts.scratch = env.clone()
+    mcts.scratch_snapshot = mcts.scratch.snapshot()
+    rng_state = env.rng.bit_generator.state
+
+    # Every simulation from this root steps "right" from the same state
+    successors = set()
+    for _ in range(20):
+        mcts.descend(None, ["right"], env)
+        world = mcts.scratch
+        successors.add((world.terrain.tobytes(), world.npcs.grid.tobytes(), world.items.grid.tobytes(), world.weather))
+    assert len(successors) > 1
+    # The environment's own generator is left alone
+    assert env.rng.bit_generator.state == rng_state
+
+def test_value_targets_are_scaled_and_discounted():
+    agent = AlphaZeroAgent(seed=0, discount=0.5, value_scale=10.0)
+    targets = agent.value_targets([-1, -1, 10])
+    assert np.allclose(targets, [0.1, 0.4, 1.0])
+    assert np.all(np.abs(agent.value_targets([-4] * 100)) <= 1.0)
+
+def test_array_tree_backs_up_discounted_rewards_like_tree_nodes():
+    visits = []
+    network = None
+    for array_tree in (False, True):
+        agent = AlphaZeroAgent(seed=0, model_based=True, array_tree=array_tree, discount=0.9, network=network)
+        network = agent.network
+        agent.mcts.num_simulations = 30
+        env = GridWorld(size=(5, 5), goal=(4, 4), seed=1)
+        agent.select_action(env.get_state(), env.get_possible_actions(), env)
+        visits.append(agent.mcts.visits)
+    assert visits[0] == visits[1]
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_root_parallel_search_with_exported_network(quantize):
+    network = AlphaZeroAgent(seed=0).network.export_inference(quantize=quantize)
+    agent = AlphaZeroAgent(seed=0, network=network, num_workers=2, parallel="root")
+    agent.mcts.num_simulations = 10
+    env = GridWorld(size=(5, 5), goal=(4, 4), seed=1)
+    try:
+        agent.select_action(env.get_state(), env.get_possible_actions())
+        assert sum(agent.mcts.visits.values()) == 10
+    finally:
+        agent.mcts.close()
@@ -0,0 +1,72 @@
+# tests/test_memory.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("lancedb")
+
+from memory import Memory
+
+def records(rng, n, dim=8, start=0):
+    return [{"vector": vector.tolist(), "text": f"m{start + i}"}
+            for i, vector in enumerate(rng.random((n, dim), dtype=np.float32))]
+
+def test_memories_go_to_their_own_vector_table(tmp_path):
+    rng = np.random.default_rng(0)
+    memory = Memory(uri=str(tmp_path), vector_dim=8, batch_size=4)
+    memory.add_memory(records(rng, 10))
+    memory.flush()
+    assert memory.table.count_rows() == 10
+    assert memory.profile_table.to_pandas()["name"].tolist() == [memory.character.name]
+    assert len(memory.search_memory(rng.random(8).tolist(), limit=3)) == 3
+
+    # Reopening leaves both tables as they are
+    reopened = Memory(uri=str(tmp_path), vector_dim=8)
+    assert reopened.table.count_rows() == 10
+    assert reopened.profile_table.count_rows() == 1
+
+def test_buffered_memories_are_written_when_the_memory_is_collected(tmp_path):
+    rng = np.random.default_rng(0)
+    memory = Memory(uri=str(tmp_path), vector_dim=8, batch_size=100, max_delay=60)
+    memory.add_memory(records(rng, 5))
+    del memory
+    import gc
+    gc.collect()
+    assert Memory(uri=str(tmp_path), vector_dim=8).table.count_rows() == 5
+
+class FailingTable:
+    def add(self, batch):
+        raise OSError("disk full")
+
+def test_failing_flush_gives_up_after_max_retries(tmp_path):
+    rng = np.random.default_rng(0)
+    memory = Memory(uri=str(tmp_path), vector_dim=8, batch_size=100, max_flush_retries=2)
+    memory._table = FailingTable()
+    memory.add_memory(records(rng, 3))
+    for _ in range(2):
+        with pytest.raises(OSError):
+            memory.flush()
+        assert len(memory.pending) == 3
+    with pytest.raises(OSError):
+        memory.flush()
+    assert memory.pending == []
+
+def test_add_memory_keeps_records_when_its_flush_fails(tmp_path):
+    rng = np.random.default_rng(0)
+    memory = Memory(uri=str(tmp_path), vector_dim=8, batch_size=2, max_flush_retries=2)
+    memory._table = FailingTable()
+    memory.add_memory(records(rng, 3))
+    assert len(memory.pending) == 3
+    with pytest.raises(OSError):
+        memory.close()
+
+def test_index_is_built_on_a_memory_table(tmp_path):
+    rng = np.random.default_rng(0)
+    memory = Memory(uri=str(tmp_path), vector_dim=32, batch_size=1000, index_threshold=1000, compact_every=0)
+    data = records(rng, 1000, dim=32)
+    memory.add_memory(data)
+    assert memory.ensure_index()
+    assert memory.is_indexed()
+    result = memory.search_memories([data[0]["vector"], data[1]["vector"]], limit=1, as_numpy=True)
+    assert sorted(result["query_index"].tolist()) == [0, 1]
+    assert result["vector"].shape == (2, 32)
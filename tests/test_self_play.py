@@ -0,0 +1,29 @@
+# tests/test_self_play.py
+
+import pytest
+
+from decision.alpha_zero import AlphaZeroAgent
+from decision.training.self_play import SelfPlayPool
+
+def test_worker_errors_reach_the_learner():
+    agent = AlphaZeroAgent(seed=0)
+    agent.config = dict(agent.config, unknown_option=1)
+    pool = SelfPlayPool(agent, 1, poll_interval=0.1)
+    try:
+        with pytest.raises(RuntimeError, match="unknown_option"):
+            next(pool.episodes(1))
+    finally:
+        pool.close()
+
+def test_dead_worker_does_not_block_the_learner():
+    agent = AlphaZeroAgent(seed=0)
+    pool = SelfPlayPool(agent, 1, poll_interval=0.1)
+    try:
+        pool.workers[0].kill()
+        pool.workers[0].join()
+        with pytest.raises(RuntimeError, match="exited"):
+            # A trajectory may already be queued; the one after it never comes
+            for _ in pool.episodes(2):
+                pass
+    finally:
+        pool.close()
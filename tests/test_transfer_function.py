@@ -0,0 +1,89 @@
+# tests/test_transfer_function.py
+
+import asyncio
+
+import pytest
+
+from helpers import DialogueStream, transfer_to_agent
+
+class FakeStream:
+    def __init__(self, tokens, error=None, delay=0.0):
+        self.tokens = list(tokens)
+        self.error = error
+        self.delay = delay
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(self.delay)
+        if self.tokens:
+            return {"message": {"content": self.tokens.pop(0)}}
+        if self.error is not None:
+            raise self.error
+        raise StopAsyncIteration
+
+    async def aclose(self):
+        self.closed = True
+
+class FakeAsyncClient:
+    """Stands in for ollama.AsyncClient, streaming a fixed list of tokens."""
+    def __init__(self, tokens, error=None, delay=0.0):
+        self.stream = FakeStream(tokens, error, delay)
+
+    async def chat(self, model, messages, stream=False):
+        assert stream
+        return self.stream
+
+def make_stream(client):
+    return DialogueStream("fake", [{"role": "user", "content": "hi"}], client=client)
+
+def test_tokens_are_merged_into_sentences():
+    client = FakeAsyncClient(["Hel", "lo there. ", "How are", " you? I'm", " fine"])
+
+    async def main():
+        return [sentence async for sentence in make_stream(client)]
+
+    assert asyncio.run(main()) == ["Hello there.", "How are you?", "I'm fine"]
+    assert client.stream.closed
+
+def test_producer_errors_reach_the_consumer():
+    client = FakeAsyncClient(["One. ", "Two"], error=ConnectionError("lost"))
+
+    async def main():
+        sentences = []
+        with pytest.raises(ConnectionError):
+            async for sentence in make_stream(client):
+                sentences.append(sentence)
+        return sentences
+
+    # Text received before the failure is still delivered
+    assert asyncio.run(main()) == ["One.", "Two"]
+    assert client.stream.closed
+
+def test_cancel_stops_generation():
+    client = FakeAsyncClient(["word. "] * 1000, delay=0.001)
+
+    async def main():
+        stream = make_stream(client)
+        async for _ in stream:
+            break
+        await stream.cancel()
+        return stream
+
+    stream = asyncio.run(main())
+    assert client.stream.closed
+    assert all(task.done() for task in stream.tasks)
+    assert stream.stats.tokens < 1000
+    assert stream.stats.end is not None
+
+def test_transfer_reports_ttft_and_token_rate():
+    client = FakeAsyncClient(["A", " short", " reply."], delay=0.01)
+    received = []
+
+    stats = asyncio.run(transfer_to_agent(received.append, stream=make_stream(client)))
+    assert received == ["A short reply."]
+    assert stats.tokens == 3
+    assert stats.ttft is not None and stats.ttft >= 0.01
+    assert stats.tokens_per_sec > 0
@@ -0,0 +1,42 @@
+# tests/test_vector_gridworld.py
+
+import numpy as np
+import pytest
+
+from decision.environment.encoding import NUM_CHANNELS
+from decision.environment.gridworld import GridWorld
+from decision.environment.vector_gridworld import ACTIONS, VectorGridWorld
+
+@pytest.mark.parametrize("num_envs", [1, 8])
+def test_step_with_random_actions(num_envs):
+    envs = VectorGridWorld(num_envs, size=(5, 5), goal=(4, 4), seed=0)
+    observations = envs.reset()
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        observations, rewards, dones = envs.step(rng.integers(len(ACTIONS), size=num_envs))
+        assert observations.shape == (num_envs, NUM_CHANNELS, 5, 5)
+        assert observations.dtype == np.float32
+        assert rewards.shape == dones.shape == (num_envs,)
+        assert (envs.npc_count >= 0).all() and (envs.item_count >= 0).all()
+
+def test_finished_environments_reset():
+    envs = VectorGridWorld(2, size=(5, 5), goal=(0, 1), max_steps=3, seed=0)
+    envs.reset()
+    # Environment 0 reaches the goal; environment 1 runs out of steps
+    _, rewards, dones = envs.step(np.array([ACTIONS.index("right"), ACTIONS.index("interact")]))
+    assert dones.tolist() == [True, False]
+    assert rewards[0] >= 95
+    assert envs.agent_pos[0].tolist() == [0, 0] and envs.steps[0] == 0
+    for _ in range(2):
+        _, _, dones = envs.step(np.array([ACTIONS.index("interact")] * 2))
+    assert dones[1] and envs.steps[1] == 0
+
+def test_action_mask_matches_gridworld():
+    envs = VectorGridWorld(1, size=(5, 5), goal=(4, 4), seed=0)
+    envs.reset()
+    world = GridWorld(size=(5, 5), goal=(4, 4), seed=0)
+    for position in [(0, 0), (0, 4), (4, 0), (2, 2), (4, 3)]:
+        envs.agent_pos[0] = position
+        world.agent_pos = position
+        legal = [action for action, ok in zip(ACTIONS, envs.action_mask()[0]) if ok]
+        assert legal == world.get_possible_actions()